@@ -1,16 +1,14 @@
-from fastapi import FastAPI, Response
+from fastapi import FastAPI, Response, Body
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, JSONResponse
 import uvicorn
 import os
 import psutil
-import cv2
-import threading
 import json
 import glob
 from datetime import datetime
-import time
+from typing import List
 
 app = FastAPI()
 
@@ -39,11 +37,10 @@ app.mount("/recordings", StaticFiles(directory=RECORDINGS_DIR), name="recordings
 
 # Global variables
 from camera_manager import RTSPStream
-from source.vision.pose_service import PoseService
+from source.services.vision_supervisor import VisionSupervisor
+from source.services.mjpeg_response import MJPEGResponse
 
 # Global variables
-active_cameras = {} # {id: RTSPStream}
-pose_services = {} # {id: PoseService}
 SETTINGS_FILE = "settings.json"
 CAMERAS_FILE = "cameras.json"
 RECORDINGS_DIR = "recordings"
@@ -59,80 +56,45 @@ def get_camera_config(camera_id: str):
                     return cam
     return None
 
-def generate_frames(camera_id: str):
-    global active_cameras
-    
-    # Initialize camera if not valid
-    if camera_id not in active_cameras or not active_cameras[camera_id].running:
-        config = get_camera_config(camera_id)
-        if not config:
-            return 
-            
-        src = config["source"]
-        
-        # Check if enabled
-        if not config.get("enabled", True):
-             # If disabled, yield blank or just return to close stream
-             return
-
-        # Handle Integer indices for webcams vs Strings for RTSP
-        if isinstance(src, str) and src.isdigit():
-            src = int(src)
-            
-        # Create and start threaded stream manager
-        stream = RTSPStream(src, name=f"Cam_{camera_id}")
-        
-        stream.start()
-        active_cameras[camera_id] = stream
-    
-    stream_manager = active_cameras[camera_id]
-    
-    while True:
-        # Check enabled status again in loop (though stream closed by toggle usually)
-        if not stream_manager.running:
-             break
-
-        # Get latest frame from thread buffer
-        success, frame = stream_manager.read()
-        
-        if not success:
-            # If manager is reconnecting or failed, yield a placeholder blank frame
-            # rather than breaking, so the HTTP stream stays alive for the browser
-            
-            # Create a black blank frame 640x360
-            import numpy as np
-            blank_frame = np.zeros((360, 640, 3), np.uint8)
-            ret, buffer = cv2.imencode('.jpg', blank_frame)
-            if ret:
-                frame_bytes = buffer.tobytes()
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-            
-            time.sleep(1.0) # Slow update for placeholder
-            continue
-            
-        # Process frame with Vision System (Throttled inside PoseService)
-        if camera_id not in pose_services:
-            pose_services[camera_id] = PoseService(camera_id=camera_id, alert_manager=alert_manager)
-        
-        try:
-            frame = pose_services[camera_id].process_frame(frame)
-        except Exception as e:
-            print(f"Vision processing error: {e}")
-            
-        ret, buffer = cv2.imencode('.jpg', frame)
-        frame_bytes = buffer.tobytes()
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-
+def load_cameras():
+    if os.path.exists(CAMERAS_FILE):
+        with open(CAMERAS_FILE, 'r') as f:
+            return json.load(f)
+    return []
 
 @app.get("/video_feed")
-def video_feed(id: str):
-    print(f"DEBUG: video_feed requested for ID: {id}")
-    return StreamingResponse(generate_frames(id), media_type="multipart/x-mixed-replace; boundary=frame")
+async def video_feed(id: str, width: int = None, quality: int = None, max_fps: float = None, mode: str = "overlay"):
+    # Optional per-client width (px), JPEG quality (10-95) and max_fps;
+    # clients asking for the same width/quality share one encode per frame.
+    # mode=raw skips server-side drawing (overlays come from /pose_feed)
+    hub = supervisor.get_hub(id)
+    if hub is None:
+        # Unknown or disabled camera
+        return Response(status_code=404)
+    if width is not None:
+        width = max(64, min(width, 3840))
+    if quality is not None:
+        quality = max(10, min(quality, 95))
+    return MJPEGResponse(hub.aframes(width=width, quality=quality, max_fps=max_fps, raw=(mode == "raw")))
+
+@app.get("/video_mosaic")
+async def video_mosaic(ids: str = None, tile_width: int = 320, cols: int = None, fps: float = 5.0, quality: int = 70):
+    # One MJPEG stream for the dashboard grid: ids="1,2,5" (default: every active camera)
+    camera_ids = [c for c in ids.split(",") if c] if ids else None
+    # The supervisor clamps cols and snaps the rest to a few shared values
+    hub = supervisor.get_mosaic(camera_ids, tile_width=tile_width, cols=cols, fps=fps, quality=quality)
+    return MJPEGResponse(hub.aframes())
 
 import asyncio
 
+@app.get("/pose_feed")
+async def pose_feed(id: str):
+    # SSE stream of keypoints, boxes, postures and track ids per inference,
+    # tagged with the capture seq sent in each /video_feed part (X-Frame-Seq)
+    if supervisor.get_hub(id) is None:
+        return Response(status_code=404)
+    return StreamingResponse(supervisor.get_pose_feed(id).messages(), media_type="text/event-stream")
+
 @app.get("/events")
 async def sse_events():
     async def event_generator():
@@ -170,10 +132,7 @@ def test_camera_connection(config: dict):
 
 @app.get("/cameras")
 def get_cameras():
-    if os.path.exists(CAMERAS_FILE):
-        with open(CAMERAS_FILE, 'r') as f:
-            return json.load(f)
-    return []
+    return load_cameras()
 
 @app.post("/cameras")
 def add_camera(camera: dict):
@@ -189,6 +148,7 @@ def add_camera(camera: dict):
     
     # Process Source
     final_source = camera.get("source")
+    sub_source = camera.get("sub_source")
     # If type is RTSP and we received structured fields, build the URL
     if camera.get("type") == "rtsp":
         user = camera.get("user", "")
@@ -198,6 +158,9 @@ def add_camera(camera: dict):
         path = camera.get("path", "")
         auth = f"{user}:{password}@" if user and password else ""
         final_source = f"rtsp://{auth}{ip}:{port}{path}"
+        # Optional low-resolution sub-stream on the same camera (e.g. /Streaming/Channels/102)
+        if camera.get("sub_path"):
+            sub_source = f"rtsp://{auth}{ip}:{port}{camera['sub_path']}"
         
     new_cam = {
         "id": new_id,
@@ -207,12 +170,15 @@ def add_camera(camera: dict):
         "enabled": True,
         "config": camera
     }
+    if sub_source:
+        new_cam["sub_source"] = sub_source
     
     cameras.append(new_cam)
     
     with open(CAMERAS_FILE, 'w') as f:
         json.dump(cameras, f, indent=4)
         
+    supervisor.sync(cameras)
     return new_cam
 
 @app.post("/cameras/{camera_id}/toggle")
@@ -231,20 +197,26 @@ def toggle_camera(camera_id: str):
         with open(CAMERAS_FILE, 'w') as f:
             json.dump(cameras, f, indent=4)
             
-        # If disabled, force stop the stream
-        if not new_status and camera_id in active_cameras:
-            active_cameras[camera_id].stop()
-            active_cameras[camera_id].stop()
-            del active_cameras[camera_id]
-        
-        # Cleanup vision service
-        if camera_id in pose_services:
-            pose_services[camera_id].close()
-            del pose_services[camera_id]
+        # Start or stop the background worker to match the new status
+        supervisor.sync(cameras)
             
         return {"status": "toggled", "enabled": new_status}
     return {"error": "Camera not found"}
 
+@app.post("/cameras/{camera_id}/zones")
+def update_camera_zones(camera_id: str, zones: List[dict] = Body(...)):
+    # Zones use normalised coordinates: {"name", "points": [[x, y], ...]} or {"name", "rect": [x1, y1, x2, y2]}
+    cameras = load_cameras()
+    for cam in cameras:
+        if str(cam["id"]) == str(camera_id):
+            cam["zones"] = zones
+            with open(CAMERAS_FILE, 'w') as f:
+                json.dump(cameras, f, indent=4)
+            # Config changed: the worker is rebuilt with the new zones
+            supervisor.sync(cameras)
+            return {"status": "saved", "zones": zones}
+    return {"error": "Camera not found"}
+
 @app.delete("/cameras/{camera_id}")
 def delete_camera(camera_id: str):
     if os.path.exists(CAMERAS_FILE):
@@ -256,16 +228,8 @@ def delete_camera(camera_id: str):
         with open(CAMERAS_FILE, 'w') as f:
             json.dump(cameras, f, indent=4)
             
-        # Stop stream if active
-        if camera_id in active_cameras:
-            active_cameras[camera_id].stop()
-            active_cameras[camera_id].stop()
-            del active_cameras[camera_id]
-            
-        # Cleanup vision service
-        if camera_id in pose_services:
-            pose_services[camera_id].close()
-            del pose_services[camera_id]
+        # Stop the background worker if active
+        supervisor.stop_camera(camera_id)
             
     return {"status": "deleted"}
 
@@ -353,7 +317,22 @@ def update_settings(settings: dict):
 
 # --- Alerts Management Endpoints ---
 from source.services.alert_manager import AlertManager
-alert_manager = AlertManager()
+
+# Capture processes are started with "spawn" and re-import this file as __mp_main__
+# when the server runs as `python api.py`: only the server builds alerts and workers
+if __name__ != "__mp_main__":
+    alert_manager = AlertManager()
+
+    # Background vision workers (run detection even with no viewer attached)
+    supervisor = VisionSupervisor(alert_manager=alert_manager, settings=get_settings().get("vision", {}))
+
+@app.on_event("startup")
+def start_vision_workers():
+    supervisor.sync(load_cameras())
+
+@app.on_event("shutdown")
+def stop_vision_workers():
+    supervisor.stop_all()
 
 @app.get("/alerts/settings")
 def get_alert_settings():
@@ -397,6 +376,21 @@ def test_full_alert():
     alert_manager._trigger_alert("TEST", "Cámara de Prueba", "Caída detectada (SIMULACRO)", 0.99, None)
     return {"status": "triggered"}
 
+# --- Keypoint Traces ---
+from source.analysis.keypoint_trace import TraceReader
+from source.vision.fall_engine import POSTURES
+
+@app.get("/traces/{camera_id}/intervals")
+def get_trace_intervals(camera_id: str, posture: str = "Caido", start: Optional[float] = None, end: Optional[float] = None):
+    # e.g. /traces/3/intervals?posture=Caido&start=<unix time a week ago>
+    if posture not in POSTURES:
+        return JSONResponse({"error": f"Unknown posture, expected one of: {', '.join(POSTURES)}"}, status_code=400)
+    reader = TraceReader(camera_id, root=supervisor.settings.get("trace_dir", "traces"))
+    return [
+        {"session": session, "track": track, "start": t0, "end": t1, "duration": round(t1 - t0, 2)}
+        for session, track, t0, t1 in reader.intervals(posture, start, end)
+    ]
+
 import shutil
 
 @app.get("/status")
@@ -405,12 +399,8 @@ def get_system_status():
     cpu = psutil.cpu_percent(interval=None)
     ram = psutil.virtual_memory().percent
     
-    # Camera Status
-    active_count = 0
-    # Check actual running streams
-    for cam_id, stream in active_cameras.items():
-        if stream.running:
-            active_count += 1
+    # Camera Status (actual running streams)
+    active_count = supervisor.active_count()
             
     cam_status = f"{active_count} Activas" if active_count > 0 else "Standby"
     
@@ -430,7 +420,8 @@ def get_system_status():
         "storage": {
             "percent": storage_percent,
             "free_gb": round(free / (1024**3), 1)
-        }
+        },
+        "inference": supervisor.inference_stats()
     }
 
 if __name__ == "__main__":
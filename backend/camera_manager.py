@@ -3,14 +3,31 @@ import threading
 import time
 import os
 
+from source.services.frame_pool import FramePool
+
 class RTSPStream:
-    def __init__(self, source, name="Camera"):
+    def __init__(self, source, name="Camera", decode="all", target_fps=None, pool_size=3):
         self.source = source
         self.name = name
+        # Decode policy: "all" decodes every frame; "on_demand" keeps the stream
+        # drained with grab() and only decodes (retrieve) when a consumer is
+        # waiting in read_next() or when target_fps is due.
+        self.decode = decode
+        self.target_fps = target_fps
         self.stream = None
         self.frame = None
         self.running = False
         self.lock = threading.Lock()
+        self.new_frame = threading.Condition(self.lock)  # Notified on every captured frame
+        self.seq = 0            # Increments once per captured frame
+        self.frame_time = 0     # Capture timestamp of self.frame
+        self.waiters = 0        # Consumers blocked in read_next()
+        # Decode into reused buffers: one holds the latest frame, one is leased
+        # to the read_next() consumer, one receives the next decode.
+        self.pool = FramePool(pool_size) if pool_size else None
+        self.leased = None      # Frame last returned by read_next(), valid until its next call
+        self.grabbed = 0
+        self.decoded = 0
         self.thread = None
         self.last_read_time = 0
         
@@ -36,7 +53,12 @@ class RTSPStream:
     def start(self):
         if self.running:
             return self
-            
+        if self.thread is not None and self.thread.is_alive():
+            # stop() timed out and the old capture thread is still in a blocking call:
+            # two threads would share self.stream, so refuse until it has exited
+            return self
+        self._clear_frame()
+
         self.running = True
         self.thread = threading.Thread(target=self._update, daemon=True)
         self.thread.start()
@@ -111,15 +133,27 @@ class RTSPStream:
                         self.stream.release()
                     continue
 
-                # Read frame
-                ret, frame = self.stream.read()
-                
+                # Grab keeps the network stream drained; retrieve (the decode) only when needed
+                ret = self.stream.grab()
                 if ret:
-                    # Debug print for first frame or occasionally
-                    # print(f"DEBUG: Frame received from {self.name}: {frame.shape}")
-                    with self.lock:
-                        self.frame = frame
-                        self.last_read_time = time.time()
+                    now = time.time()
+                    self.last_read_time = now
+                    self.grabbed += 1
+                    if self._should_decode(now):
+                        buf = self.pool.acquire(self.frame.shape) if self.pool and self.frame is not None else None
+                        ok, frame = self.stream.retrieve(buf) if buf is not None else self.stream.retrieve()
+                        if buf is not None and frame is not buf:
+                            # Decoder reallocated (new resolution) or failed: buffer stays free
+                            self.pool.release(buf)
+                        if ok and frame is not None:
+                            with self.new_frame:
+                                previous = self.frame
+                                self.frame = frame
+                                self.frame_time = now
+                                self.seq += 1
+                                self.decoded += 1
+                                self._recycle(previous)
+                                self.new_frame.notify_all()
                 else:
                     print(f"[CAM] Frame read failed for {self.name} (Ret: {ret}). Reconnecting...")
                     self.connected = False
@@ -134,16 +168,62 @@ class RTSPStream:
                     self.stream.release()
                 time.sleep(retry_delay)
 
+        # Stopped; also covers a stop() that gave up waiting for this thread
+        self.connected = False
+        if self.stream:
+            self.stream.release()
+
+    def _recycle(self, buf):
+        """Return buf to the pool unless it is still the latest or the leased frame. Caller holds the lock."""
+        if self.pool and buf is not None and buf is not self.frame and buf is not self.leased:
+            self.pool.release(buf)
+
+    def _should_decode(self, now):
+        if self.decode == "all" or self.frame is None or self.waiters:
+            return True
+        return bool(self.target_fps) and now - self.frame_time >= 1.0 / self.target_fps
+
     def read(self):
         with self.lock:
             return self.frame is not None, self.frame
 
+    def read_next(self, after_seq=0, timeout=1.0):
+        """
+        Block until a frame newer than after_seq is captured.
+        Returns (success, frame, seq, capture_time); success is False on timeout or stop.
+        The frame is a pooled buffer the caller may draw on; it is recycled on
+        the caller's next read_next(), so copy() anything kept longer.
+        """
+        with self.new_frame:
+            self.waiters += 1
+            try:
+                self.new_frame.wait_for(lambda: self.seq > after_seq or not self.running, timeout=timeout)
+            finally:
+                self.waiters -= 1
+            if self.seq > after_seq and self.frame is not None:
+                previous = self.leased
+                self.leased = self.frame
+                self._recycle(previous)
+                return True, self.frame, self.seq, self.frame_time
+            return False, None, after_seq, None
+
+    def _clear_frame(self):
+        # A restarted stream must not hand out the previous session's frame.
+        # seq keeps counting so read_next(after_seq) callers are not confused
+        with self.new_frame:
+            previous, self.frame = self.frame, None
+            self.frame_time = 0
+            self._recycle(previous)
+
     def stop(self):
         self.running = False
+        with self.new_frame:
+            self.new_frame.notify_all()
         if self.thread:
             self.thread.join(timeout=1.0)
-        if self.stream:
-            self.stream.release()
+        self._clear_frame()
+        if self.stream and not (self.thread and self.thread.is_alive()):
+            self.stream.release()  # Otherwise the capture thread releases it on exit
             
     @staticmethod
     def test_connection(source):
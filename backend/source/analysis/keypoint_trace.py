@@ -0,0 +1,285 @@
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from source.vision.detections import NUM_KEYPOINTS
+from source.vision.fall_engine import FallEngine, POSTURES, EVENTS
+
+DEFAULT_TRACE_DIR = "traces"
+
+# Column name -> (dtype, per-row shape)
+COLUMNS = {
+    "ts": (np.float64, ()),                       # Capture time (unix seconds)
+    "track": (np.int32, ()),                      # Track id inside the camera
+    "keypoints": (np.float16, (NUM_KEYPOINTS, 2)),  # Normalised x/y, full frame
+    "conf": (np.uint8, (NUM_KEYPOINTS,)),         # Keypoint confidence * 255
+    "posture": (np.int8, ()),                     # Index into POSTURES
+    "event": (np.int8, ()),                       # Index into EVENTS (0 = none)
+}
+# Not stored per row: every chunk belongs to one writer session, recorded in
+# its index entry, and load() expands it into a column on request
+SESSION_COLUMN = "session"
+
+
+def _camera_dir(root, camera_id):
+    return os.path.join(root, f"cam_{camera_id}")
+
+
+class TraceWriter:
+    """
+    Append-only columnar keypoint trace for one camera.
+
+    Rows (one per tracked person per inference) are buffered in preallocated
+    arrays and written as one .npy file per column per chunk:
+
+        traces/cam_<id>/<YYYY-MM-DD>/<chunk>.<column>.npy
+
+    Each finished chunk appends a line to traces/cam_<id>/index.jsonl with its
+    time range, row count and the postures/events it contains, so queries can
+    skip chunks without opening them. Chunks are plain .npy and can be
+    memory-mapped for reading.
+
+    Track ids restart at 1 whenever a worker is rebuilt, so each writer has a
+    session id (its start time in ms) stored in every index entry; a person
+    is identified by (session, track).
+
+    Day directories older than max_days (and their index lines) are deleted,
+    checked at most once an hour when a chunk is written.
+    """
+
+    def __init__(self, camera_id, root=DEFAULT_TRACE_DIR, chunk_rows=4096, chunk_seconds=60.0, max_days=7):
+        self.camera_id = str(camera_id)
+        self.dir = _camera_dir(root, self.camera_id)
+        self.chunk_rows = chunk_rows
+        self.chunk_seconds = chunk_seconds
+        self.max_days = max_days
+        self.last_prune = 0
+        self.session = int(time.time() * 1000)
+        self.lock = threading.Lock()
+
+        os.makedirs(self.dir, exist_ok=True)
+        self.buffers = {name: np.zeros((chunk_rows,) + shape, dtype) for name, (dtype, shape) in COLUMNS.items()}
+        self.rows = 0
+        self.chunk_started = None
+
+    def append(self, ts, tracks, keypoints, conf, postures, events):
+        """Append N rows (one per person) observed at time ts."""
+        n = len(tracks)
+        if n == 0:
+            return
+        with self.lock:
+            if self.chunk_started is None:
+                self.chunk_started = time.time()
+
+            start = 0
+            while start < n:
+                take = min(n - start, self.chunk_rows - self.rows)
+                sl = slice(self.rows, self.rows + take)
+                src = slice(start, start + take)
+                self.buffers["ts"][sl] = ts
+                self.buffers["track"][sl] = np.asarray(tracks)[src]
+                self.buffers["keypoints"][sl] = np.asarray(keypoints)[src]
+                self.buffers["conf"][sl] = np.clip(np.asarray(conf)[src] * 255, 0, 255)
+                self.buffers["posture"][sl] = np.asarray(postures)[src]
+                self.buffers["event"][sl] = np.asarray(events)[src]
+                self.rows += take
+                start += take
+                if self.rows >= self.chunk_rows:
+                    self._flush_locked()
+
+            if self.rows and time.time() - self.chunk_started >= self.chunk_seconds:
+                self._flush_locked()
+
+    def _flush_locked(self):
+        if self.rows == 0:
+            return
+        n = self.rows
+        ts = self.buffers["ts"][:n]
+        t0, t1 = float(ts[0]), float(ts[-1])
+
+        day = datetime.fromtimestamp(t0).strftime("%Y-%m-%d")
+        day_dir = os.path.join(self.dir, day)
+        os.makedirs(day_dir, exist_ok=True)
+        chunk = f"{int(t0 * 1000)}"
+
+        for name in COLUMNS:
+            np.save(os.path.join(day_dir, f"{chunk}.{name}.npy"), self.buffers[name][:n])
+
+        postures = np.unique(self.buffers["posture"][:n]).tolist()
+        events = np.unique(self.buffers["event"][:n]).tolist()
+        entry = {
+            "chunk": f"{day}/{chunk}",
+            "session": self.session,
+            "t0": t0,
+            "t1": t1,
+            "rows": n,
+            "postures": [POSTURES[p] for p in postures],
+            "events": [EVENTS[e] for e in events if e],
+        }
+        # Index line is written last: a chunk is only visible once complete
+        with open(os.path.join(self.dir, "index.jsonl"), "a") as f:
+            f.write(json.dumps(entry) + "\n")
+
+        self.rows = 0
+        self.chunk_started = None
+
+        if self.max_days and time.time() - self.last_prune > 3600:
+            self._prune_locked()
+
+    def _prune_locked(self):
+        """Delete day directories older than max_days and drop their index lines."""
+        self.last_prune = time.time()
+        cutoff = datetime.fromtimestamp(time.time() - self.max_days * 86400).strftime("%Y-%m-%d")
+        old_days = [d for d in os.listdir(self.dir)
+                    if d < cutoff and os.path.isdir(os.path.join(self.dir, d))]
+        if not old_days:
+            return
+
+        index_path = os.path.join(self.dir, "index.jsonl")
+        if os.path.exists(index_path):
+            lines = []
+            with open(index_path, "r") as f:
+                for line in f:
+                    try:
+                        day = json.loads(line)["chunk"].split("/", 1)[0]
+                    except (ValueError, KeyError):
+                        continue  # Partially written line
+                    if day >= cutoff:
+                        lines.append(line)
+            tmp_path = index_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                f.writelines(lines)
+            os.replace(tmp_path, index_path)  # Index first: readers never see a missing chunk
+        for day in old_days:
+            shutil.rmtree(os.path.join(self.dir, day), ignore_errors=True)
+        print(f"[Traces] Cam {self.camera_id}: deleted {len(old_days)} day(s) older than {self.max_days} days")
+
+    def flush(self):
+        with self.lock:
+            self._flush_locked()
+
+    def close(self):
+        self.flush()
+
+
+class TraceReader:
+    """Query a camera's keypoint trace without touching video."""
+
+    def __init__(self, camera_id, root=DEFAULT_TRACE_DIR):
+        self.camera_id = str(camera_id)
+        self.dir = _camera_dir(root, self.camera_id)
+
+    def index(self, start=None, end=None, posture=None):
+        """Index entries overlapping [start, end] (and containing posture, if given)."""
+        path = os.path.join(self.dir, "index.jsonl")
+        if not os.path.exists(path):
+            return []
+        entries = []
+        with open(path, "r") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # Partially written line
+                if start is not None and entry["t1"] < start:
+                    continue
+                if end is not None and entry["t0"] > end:
+                    continue
+                if posture is not None and posture not in entry["postures"]:
+                    continue
+                entries.append(entry)
+        return entries
+
+    def load_chunk(self, chunk, columns=None, mmap=True):
+        columns = columns or list(COLUMNS)
+        base = os.path.join(self.dir, chunk)
+        return {name: np.load(f"{base}.{name}.npy", mmap_mode="r" if mmap else None) for name in columns}
+
+    def load(self, start=None, end=None, columns=None, posture=None):
+        """
+        Concatenate the rows in [start, end] across chunks (column -> array).
+        "session" may be requested as a column (0 for chunks written before sessions).
+        """
+        columns = list(columns or COLUMNS)
+        if "ts" not in columns:
+            columns.append("ts")
+        stored = [name for name in columns if name != SESSION_COLUMN]
+
+        parts = {name: [] for name in columns}
+        for entry in self.index(start, end, posture):
+            data = self.load_chunk(entry["chunk"], stored)
+            mask = np.ones(len(data["ts"]), bool)
+            if start is not None:
+                mask &= data["ts"] >= start
+            if end is not None:
+                mask &= data["ts"] <= end
+            for name in stored:
+                parts[name].append(np.asarray(data[name][mask]))
+            if SESSION_COLUMN in parts:
+                parts[SESSION_COLUMN].append(np.full(int(mask.sum()), entry.get("session", 0), np.int64))
+
+        out = {}
+        for name in columns:
+            dtype, shape = COLUMNS.get(name, (np.int64, ()))
+            out[name] = np.concatenate(parts[name]) if parts[name] else np.zeros((0,) + shape, dtype)
+        return out
+
+    def intervals(self, posture="Caido", start=None, end=None, max_gap=1.0):
+        """
+        [(session, track, t_start, t_end)] for every stretch where a track held
+        `posture`. Samples further apart than max_gap seconds split an interval.
+        """
+        if posture not in POSTURES:
+            raise ValueError(f"Unknown posture {posture!r}, expected one of {POSTURES}")
+        code = POSTURES.index(posture)
+        data = self.load(start, end, columns=["ts", "track", "posture", SESSION_COLUMN], posture=posture)
+        if len(data["ts"]) == 0:
+            return []
+
+        order = np.lexsort((data["ts"], data["track"], data[SESSION_COLUMN]))
+        ts, track, post = data["ts"][order], data["track"][order], data["posture"][order]
+        session = data[SESSION_COLUMN][order]
+
+        # Drop non-matching rows but keep them as breaks inside each track
+        match = post == code
+        new_run = np.ones(len(ts), bool)
+        new_run[1:] = ((session[1:] != session[:-1]) | (track[1:] != track[:-1]) |
+                       (ts[1:] - ts[:-1] > max_gap) | ~match[:-1])
+        run_id = np.cumsum(new_run)
+
+        result = []
+        for rid in np.unique(run_id[match]):
+            rows = np.flatnonzero((run_id == rid) & match)
+            result.append((int(session[rows[0]]), int(track[rows[0]]), float(ts[rows[0]]), float(ts[rows[-1]])))
+        return sorted(result, key=lambda r: r[2])
+
+
+def replay_trace(reader, start=None, end=None, **params):
+    """
+    Feed a stored trace back through a FallEngine (optionally with different
+    thresholds). Returns [(ts, (session, track), posture, event)] for every event.
+    """
+    data = reader.load(start, end, columns=["ts", "track", "keypoints", SESSION_COLUMN])
+    if len(data["ts"]) == 0:
+        return []
+
+    order = np.argsort(data["ts"], kind="stable")
+    ts, kpts = data["ts"][order], data["keypoints"][order].astype(np.float64)
+    tracks = list(zip(data[SESSION_COLUMN][order].tolist(), data["track"][order].tolist()))
+
+    engine = FallEngine(**params)
+    events = []
+    # One vectorised update per inference timestamp, covering every track seen at that time
+    boundaries = np.flatnonzero(np.diff(ts)) + 1
+    for rows in np.split(np.arange(len(ts)), boundaries):
+        keys = [tracks[i] for i in rows]
+        slots = [engine.allocate(key) for key in keys]
+        posture, event, _ = engine.update(slots, kpts[rows], ts[rows[0]])
+        for i in np.flatnonzero(event):
+            events.append((float(ts[rows[0]]), keys[i], POSTURES[posture[i]], EVENTS[event[i]]))
+    return events
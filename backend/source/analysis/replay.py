@@ -0,0 +1,145 @@
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+
+from source.vision.pose_service import PoseService
+
+# recordings/event_<camera>_<unix time>.mp4 (AlertManager naming)
+RECORDING_NAME = re.compile(r"event_(?P<camera>[^_]+)_(?P<ts>\d+)\.mp4$")
+
+
+class ReplayClock:
+    """Clock driven by frame timestamps instead of the wall clock."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def replay_file(path, settings=None):
+    """
+    Run the full PoseService / FallEngine pipeline over a video file as fast
+    as the CPU allows. Detector timing comes from the frame timestamps, so a
+    5 s confirmation takes 5 s of video, not 5 s of wall time.
+    Returns the file's event timeline.
+    """
+    settings = dict(settings or {})
+    # The cascade loads and runs asynchronously, which would make replays depend on wall time
+    settings["confirm_model"] = None
+    clock = ReplayClock()
+    events = []
+
+    def on_event(track_id, event, posture, timestamp):
+        events.append({"t": round(timestamp, 3), "track": track_id, "event": event, "posture": posture})
+
+    service = PoseService(camera_id=os.path.basename(path), settings=settings,
+                          clock=clock, event_callback=on_event)
+    if service.disabled:
+        return {"file": path, "error": "vision system unavailable"}
+
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        return {"file": path, "error": "cannot open file"}
+
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    frame_index = 0
+    analysed = 0
+    segments = []   # Closed posture segments
+    open_segments = {}  # {track_id: {"posture", "start"}}
+    started = time.time()
+
+    while cap.grab():
+        # Container timestamp when available, frame count otherwise
+        pos_msec = cap.get(cv2.CAP_PROP_POS_MSEC)
+        clock.now = pos_msec / 1000.0 if pos_msec > 0 else frame_index / fps
+        frame_index += 1
+
+        # Only decode frames the throttled pipeline would actually look at
+        if clock.now - service.last_inference_time <= service.inference_interval:
+            continue
+        ret, frame = cap.retrieve()
+        if not ret:
+            break
+
+        service.analyze(frame, clock.now)
+        analysed += 1
+
+        current = service.track_postures
+        for track_id in list(open_segments):
+            seg = open_segments[track_id]
+            if current.get(track_id) != seg["posture"]:
+                segments.append({"track": track_id, "posture": seg["posture"],
+                                 "start": round(seg["start"], 3), "end": round(clock.now, 3)})
+                del open_segments[track_id]
+        for track_id, posture in current.items():
+            if track_id not in open_segments:
+                open_segments[track_id] = {"posture": posture, "start": clock.now}
+
+    cap.release()
+    service.close()
+
+    for track_id, seg in open_segments.items():
+        segments.append({"track": track_id, "posture": seg["posture"],
+                         "start": round(seg["start"], 3), "end": round(clock.now, 3)})
+
+    elapsed = time.time() - started
+    timeline = {
+        "file": path,
+        "frames": frame_index,
+        "analysed_frames": analysed,
+        "duration": round(clock.now, 3),
+        "processing_time": round(elapsed, 3),
+        "speedup": round(clock.now / elapsed, 2) if elapsed > 0 else None,
+        "events": events,
+        "postures": sorted(segments, key=lambda s: (s["start"], s["track"])),
+    }
+
+    match = RECORDING_NAME.search(os.path.basename(path))
+    if match:
+        # Absolute time of the clip start, so events can be lined up with alerts
+        timeline["camera"] = match.group("camera")
+        timeline["origin"] = int(match.group("ts"))
+
+    return timeline
+
+
+def _init_worker(threads):
+    # One inference thread pool per process, sized so workers don't oversubscribe the CPU
+    cv2.setNumThreads(1)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+
+def replay_files(paths, workers=None, settings=None, output_dir=None):
+    """
+    Replay many files across a process pool. Yields each timeline as it
+    finishes and, if output_dir is set, writes <name>.timeline.json there.
+    """
+    workers = workers or max(1, (os.cpu_count() or 2) // 2)
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(threads,)) as pool:
+        futures = {pool.submit(replay_file, path, settings): path for path in paths}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                timeline = future.result()
+            except Exception as e:
+                timeline = {"file": path, "error": str(e)}
+
+            if output_dir:
+                name = os.path.splitext(os.path.basename(path))[0] + ".timeline.json"
+                with open(os.path.join(output_dir, name), "w") as f:
+                    json.dump(timeline, f, indent=4)
+            yield timeline
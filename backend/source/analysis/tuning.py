@@ -0,0 +1,185 @@
+import itertools
+import json
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from source.analysis.keypoint_trace import TraceReader, DEFAULT_TRACE_DIR
+from source.vision.fall_engine import FallEngine, DEFAULT_PARAMS, CAIDA_CONFIRMADA
+
+TUNABLE = ("shoulder_ankle", "body_height", "knee_hip", "state_delay", "confirm_time", "window")
+
+
+def load_sequences(labels_path, trace_dir=DEFAULT_TRACE_DIR):
+    """
+    Labelled keypoint sequences from a JSON list. Each entry is either a
+    stored trace or an .npz file (arrays "ts" and "keypoints" of one person):
+
+        {"camera": "3", "track": 5, "start": 1760000000, "end": 1760000600,
+         "falls": [[1760000100, 1760000160]]}
+        {"file": "labelled/seq1.npz", "falls": [[12.0, 30.0]]}
+
+    "falls" are the ground-truth fall intervals [start, end] in the sequence's
+    own time base. Without "track", all rows of the trace window are treated
+    as one person (fine for single-occupancy rooms).
+    """
+    with open(labels_path, "r") as f:
+        entries = json.load(f)
+
+    base_dir = os.path.dirname(os.path.abspath(labels_path))
+    sequences = []
+    for entry in entries:
+        if "file" in entry:
+            path = entry["file"]
+            if not os.path.isabs(path):
+                path = os.path.join(base_dir, path)
+            data = np.load(path)
+            ts, keypoints = data["ts"], data["keypoints"]
+            name = entry["file"]
+        else:
+            reader = TraceReader(entry["camera"], root=trace_dir)
+            data = reader.load(entry.get("start"), entry.get("end"), columns=["ts", "track", "keypoints", "session"])
+            mask = np.ones(len(data["ts"]), bool)
+            if "track" in entry:
+                mask = data["track"] == entry["track"]
+            if "session" in entry:
+                mask &= data["session"] == entry["session"]
+            ts, keypoints = data["ts"][mask], data["keypoints"][mask]
+            name = f"cam_{entry['camera']}:{entry.get('track', '*')}@{entry.get('start')}"
+
+        order = np.argsort(ts, kind="stable")
+        sequences.append({
+            "name": name,
+            "ts": np.asarray(ts, np.float64)[order],
+            "keypoints": np.asarray(keypoints, np.float64)[order],
+            "falls": [tuple(f) for f in entry.get("falls", [])],
+        })
+    return sequences
+
+
+def grid_configs(grid):
+    """Cartesian product of {"param": [values, ...]} (missing params keep defaults)."""
+    names = [n for n in TUNABLE if n in grid]
+    configs = []
+    for values in itertools.product(*(grid[n] for n in names)):
+        config = {n: DEFAULT_PARAMS[n] for n in TUNABLE}
+        config.update(dict(zip(names, values)))
+        configs.append(config)
+    return configs
+
+
+def random_configs(ranges, samples, seed=0):
+    """samples configs drawn uniformly from {"param": [min, max]} (window is an integer)."""
+    rng = random.Random(seed)
+    configs = []
+    for _ in range(samples):
+        config = {n: DEFAULT_PARAMS[n] for n in TUNABLE}
+        for name, (low, high) in ranges.items():
+            if name == "window":
+                config[name] = rng.randint(int(low), int(high))
+            else:
+                config[name] = round(rng.uniform(low, high), 4)
+        configs.append(config)
+    return configs
+
+
+def _score(confirmed, falls, tolerance):
+    """Match confirmed-fall times against labelled intervals: (tp, fp, fn, [latencies])."""
+    confirmed = np.asarray(confirmed, np.float64)
+    matched = np.zeros(len(confirmed), bool)
+    tp, fn, latencies = 0, 0, []
+    for start, end in falls:
+        hit = (confirmed >= start) & (confirmed <= end + tolerance)
+        matched |= hit
+        if hit.any():
+            tp += 1
+            latencies.append(float(confirmed[hit][0] - start))
+        else:
+            fn += 1
+    fp = int((~matched).sum())
+    return tp, fp, fn, latencies
+
+
+def evaluate_configs(configs, sequences, tolerance=2.0):
+    """
+    Run every config over every sequence. All configs advance together as
+    slots of one FallEngine, so each timestep is a single vectorised update.
+    """
+    k = len(configs)
+    totals = [{"tp": 0, "fp": 0, "fn": 0, "latencies": []} for _ in range(k)]
+    max_window = max(int(c.get("window", DEFAULT_PARAMS["window"])) for c in configs)
+
+    for seq in sequences:
+        engine = FallEngine(capacity=k, max_window=max_window)
+        slots = np.array([engine.allocate(i, **config) for i, config in enumerate(configs)])
+        confirmed = [[] for _ in range(k)]
+
+        for t, kpts in zip(seq["ts"], seq["keypoints"]):
+            _, events, _ = engine.update(slots, np.broadcast_to(kpts, (k,) + kpts.shape), t)
+            for i in np.flatnonzero(events == CAIDA_CONFIRMADA):
+                confirmed[i].append(t)
+
+        for i in range(k):
+            tp, fp, fn, latencies = _score(confirmed[i], seq["falls"], tolerance)
+            totals[i]["tp"] += tp
+            totals[i]["fp"] += fp
+            totals[i]["fn"] += fn
+            totals[i]["latencies"].extend(latencies)
+
+    report = []
+    for config, total in zip(configs, totals):
+        tp, fp, fn = total["tp"], total["fp"], total["fn"]
+        precision = tp / (tp + fp) if tp + fp else 0.0
+        recall = tp / (tp + fn) if tp + fn else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        latencies = total["latencies"]
+        report.append({
+            "params": config,
+            "tp": tp, "fp": fp, "fn": fn,
+            "precision": round(precision, 4),
+            "recall": round(recall, 4),
+            "f1": round(f1, 4),
+            "latency_mean": round(float(np.mean(latencies)), 3) if latencies else None,
+            "latency_max": round(float(np.max(latencies)), 3) if latencies else None,
+        })
+    return report
+
+
+def tune(configs, sequences, workers=None, tolerance=2.0):
+    """Spread configs over all cores; returns the report sorted best-first (F1, then latency)."""
+    workers = workers or os.cpu_count() or 1
+    chunk = max(1, -(-len(configs) // workers))
+    chunks = [configs[i:i + chunk] for i in range(0, len(configs), chunk)]
+
+    report = []
+    if len(chunks) == 1:
+        report = evaluate_configs(chunks[0], sequences, tolerance)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(evaluate_configs, c, sequences, tolerance) for c in chunks]
+            for future in futures:
+                report.extend(future.result())
+
+    def sort_key(row):
+        latency = row["latency_mean"] if row["latency_mean"] is not None else float("inf")
+        return (-row["f1"], -row["precision"], latency)
+
+    return sorted(report, key=sort_key)
+
+
+def write_camera_params(cameras_file, camera_id, params):
+    """Store tuned thresholds in the camera's "vision" block, picked up by PoseService."""
+    with open(cameras_file, "r") as f:
+        cameras = json.load(f)
+
+    for cam in cameras:
+        if str(cam["id"]) == str(camera_id):
+            cam.setdefault("vision", {})["fall_params"] = params
+            break
+    else:
+        raise KeyError(f"Camera {camera_id} not found in {cameras_file}")
+
+    with open(cameras_file, "w") as f:
+        json.dump(cameras, f, indent=4)
@@ -8,6 +8,11 @@ import queue
 import uuid
 from datetime import datetime
 
+from source.services.preroll import PrerollBuffer, write_frames
+
+RECORDING_FPS = 20.0
+RECORDING_QUEUE = 100  # Frames waiting for the writer thread before new ones are dropped
+
 class AlertManager:
     def __init__(self, settings_file="alerts_settings.json", history_file="alerts_history.json"):
         self.settings_file = settings_file
@@ -17,9 +22,12 @@ class AlertManager:
         self.history = self._load_history()
         
         # State tracking
-        self.camera_cooldowns = {} # {camera_id: last_alert_timestamp}
-        self.ongoing_falls = {} # {camera_id: {start_time: float, alerted: bool}}
-        self.active_recordings = {} # {camera_id: {writer: cv2.VideoWriter, path: str, start_time: float}}
+        self.camera_cooldowns = {} # {camera_id: last_alert_timestamp}, one alert per room whichever person fell
+        self.ongoing_falls = {} # {camera_id or "camera_id#track_id": {start_time, alerted, camera_id, lost_at}}
+        self.falls_lock = threading.RLock() # Cooldowns and falls are updated from every camera's hub thread
+        self.active_recordings = {} # {camera_id: {writer, path, start_time, queue, thread}}, written on the thread
+        self.prerolls = {} # {camera_id: PrerollBuffer} last seconds before an alert, as JPEG
+        self.preroll_lock = threading.Lock()
         
     def _load_settings(self):
         defaults = {
@@ -30,7 +38,12 @@ class AlertManager:
             "cooldown": 60, 
             "attach_image": True,
             "save_snapshot": True,
-            "notification_duration": 5
+            "notification_duration": 5,
+            "lost_grace": 10.0,      # Seconds a fallen person may be out of tracking before counting as recovered
+            "preroll_seconds": None, # Seconds of video kept before the alert (None: min_duration + preroll_margin, 0 disables)
+            "preroll_margin": 3.0,   # Covers the detection latency before the fall timer starts
+            "preroll_max_mb": 4.0,   # Memory cap per camera
+            "preroll_fps": 10.0
         }
 
         settings = defaults.copy()
@@ -208,56 +221,108 @@ class AlertManager:
         except Exception as e:
             return False, str(e)
 
-    def process_event(self, camera_id, camera_name, event_type, confidence, frame=None):
+    def process_event(self, camera_id, camera_name, event_type, confidence, frame=None, track_id=None):
         """
         Main entry point for vision system to report events.
+        track_id identifies the person inside the camera, so two people in the
+        same room get independent fall timers; the cooldown stays per camera.
+        "Perdido" reports a track the tracker dropped: a fall in progress is
+        kept for lost_grace seconds and handed over if a new track in the same
+        camera falls meanwhile (the tracker re-acquiring the same person).
         """
         if not self.settings.get("enabled"):
             return
 
         now = time.time()
-        
-        # Logic for Fall Detection (Duration check)
-        if event_type == "Caída detectada":
-            if camera_id not in self.ongoing_falls:
-                self.ongoing_falls[camera_id] = {"start_time": now, "alerted": False}
-                return # Wait for duration
-            else:
+        key = camera_id if track_id is None else f"{camera_id}#{track_id}"
+
+        # Fall state is shared by every camera's hub thread
+        with self.falls_lock:
+            self._expire_lost(camera_id, camera_name, now)
+
+            # Logic for Fall Detection (Duration check)
+            if event_type == "Caída detectada":
+                if key not in self.ongoing_falls:
+                    lost = self._take_lost(camera_id)
+                    if lost is None:
+                        self.ongoing_falls[key] = {"start_time": now, "alerted": False, "camera_id": camera_id}
+                        return # Wait for duration
+                    self.ongoing_falls[key] = lost # Same fall, new track id
+
                 # Check duration
-                elapsed = now - self.ongoing_falls[camera_id]["start_time"]
+                elapsed = now - self.ongoing_falls[key]["start_time"]
                 if elapsed < self.settings.get("min_duration", 0):
                     return # Not long enough yet
-                
-                if self.ongoing_falls[camera_id]["alerted"]:
+
+                if self.ongoing_falls[key]["alerted"]:
                     return # Already alerted for this specific fall instance
-        
-        elif event_type == "Recuperación" or event_type == "Normal":
-            if camera_id in self.ongoing_falls:
-                # Stop recording if active and send result
-                self.stop_recording(camera_id, camera_name)
-                del self.ongoing_falls[camera_id]
-            return
 
-        # Cooldown Check
-        last_alert = self.camera_cooldowns.get(camera_id, 0)
-        cooldown = self.settings.get("cooldown", 60)
-        
-        if now - last_alert < cooldown:
-            print(f"[AlertManager] Ignorando alerta por cooldown para {camera_name}")
-            return
+            elif event_type == "Perdido":
+                if key in self.ongoing_falls:
+                    self.ongoing_falls[key].setdefault("lost_at", now)
+                return
+
+            elif event_type == "Recuperación" or event_type == "Normal":
+                if key in self.ongoing_falls:
+                    del self.ongoing_falls[key]
+                    self._stop_if_clear(camera_id, camera_name)
+                return
+
+            # Cooldown Check
+            last_alert = self.camera_cooldowns.get(camera_id, 0)
+            cooldown = self.settings.get("cooldown", 60)
+
+            if now - last_alert < cooldown:
+                print(f"[AlertManager] Ignorando alerta por cooldown para {camera_name}")
+                return
+
+            # Update state
+            self.camera_cooldowns[camera_id] = now
+            if key in self.ongoing_falls:
+                self.ongoing_falls[key]["alerted"] = True
 
         # Trigger Alert
-        self._trigger_alert(camera_id, camera_name, event_type, confidence, frame)
+        self._trigger_alert(camera_id, camera_name, event_type, confidence, frame, track_id)
         
         # Start recording immediately
         self.start_recording(camera_id, frame)
-        
-        # Update state
-        self.camera_cooldowns[camera_id] = now
-        if camera_id in self.ongoing_falls:
-            self.ongoing_falls[camera_id]["alerted"] = True
 
-    def _trigger_alert(self, camera_id, camera_name, event_type, confidence, frame):
+    def expire(self, camera_id, camera_name="Cámara"):
+        """
+        Time out lost falls of this camera. Called for every processed frame,
+        since an empty room sends no events that would do it.
+        """
+        if not self.settings.get("enabled"):
+            return
+        with self.falls_lock:
+            self._expire_lost(camera_id, camera_name, time.time())
+
+    def _take_lost(self, camera_id):
+        """Remove and return the most recently lost fall of this camera (None if there is none). Needs falls_lock."""
+        lost = [(f["lost_at"], k) for k, f in self.ongoing_falls.items()
+                if f.get("camera_id") == camera_id and "lost_at" in f]
+        if not lost:
+            return None
+        fall = self.ongoing_falls.pop(max(lost)[1])
+        del fall["lost_at"]
+        return fall
+
+    def _expire_lost(self, camera_id, camera_name, now):
+        """Falls whose person stayed out of tracking for lost_grace seconds count as recovered. Needs falls_lock."""
+        grace = self.settings.get("lost_grace", 10.0)
+        expired = [k for k, f in self.ongoing_falls.items()
+                   if f.get("camera_id") == camera_id and now - f.get("lost_at", now) >= grace]
+        for k in expired:
+            del self.ongoing_falls[k]
+        if expired:
+            self._stop_if_clear(camera_id, camera_name)
+
+    def _stop_if_clear(self, camera_id, camera_name):
+        # Stop recording (and send result) once nobody in this camera is down. Needs falls_lock
+        if not any(f.get("camera_id") == camera_id for f in self.ongoing_falls.values()):
+            self.stop_recording(camera_id, camera_name)
+
+    def _trigger_alert(self, camera_id, camera_name, event_type, confidence, frame, track_id=None):
         # Prepare content
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         title = "⚠️ <b>ALERTA DE SEGURIDAD</b>"
@@ -269,6 +334,8 @@ class AlertManager:
             f"<b>Confianza:</b> {confidence:.0%}\n"
             f"<b>Hora:</b> {timestamp}\n"
         )
+        if track_id is not None:
+            msg += f"<b>Persona:</b> #{track_id}\n"
 
         image_bytes = None
         snapshot_path = None
@@ -293,10 +360,10 @@ class AlertManager:
 
         # Send in background thread to not block vision loop
         threading.Thread(target=self._dispatch_alert, 
-                         args=(msg, image_bytes, camera_id, camera_name, event_type, snapshot_path)
+                         args=(msg, image_bytes, camera_id, camera_name, event_type, snapshot_path, track_id)
         ).start()
 
-    def _dispatch_alert(self, msg, image_bytes, camera_id, camera_name, event_type, snapshot_path):
+    def _dispatch_alert(self, msg, image_bytes, camera_id, camera_name, event_type, snapshot_path, track_id=None):
         token = self.settings.get("telegram_token")
         chat_ids = self.settings.get("telegram_chat_ids", [])
         
@@ -322,7 +389,8 @@ class AlertManager:
             "event": event_type,
             "status": "Enviado" if any_success else "Fallido",
             "details": ", ".join(details_log),
-            "snapshot": snapshot_path
+            "snapshot": snapshot_path,
+            "person": track_id
         }
         self.history.append(entry)
         self._save_history()
@@ -358,49 +426,136 @@ class AlertManager:
             # If this fails, try 'vp80' or 'mp4v' (but mp4v often fails in browser)
             try:
                 fourcc = cv2.VideoWriter_fourcc(*'avc1') 
-                writer = cv2.VideoWriter(filepath, fourcc, 20.0, (width, height))
+                writer = cv2.VideoWriter(filepath, fourcc, RECORDING_FPS, (width, height))
                 if not writer.isOpened():
                     # Fallback if avc1 is not supported on this OS
                     print("[AlertManager] H.264 codec not found, falling back to mp4v")
                     fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-                    writer = cv2.VideoWriter(filepath, fourcc, 20.0, (width, height))
+                    writer = cv2.VideoWriter(filepath, fourcc, RECORDING_FPS, (width, height))
             except:
                  fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-                 writer = cv2.VideoWriter(filepath, fourcc, 20.0, (width, height))
+                 writer = cv2.VideoWriter(filepath, fourcc, RECORDING_FPS, (width, height))
             
-            self.active_recordings[camera_id] = {
+            # Seconds before the alert first, played back in real time. Decoding and
+            # writing happen on the recording's own thread, not on the vision loop
+            now = time.time()
+            preroll = self.prerolls.get(camera_id)
+            preroll_frames = preroll.drain() if preroll is not None else []
+            rec = {
                 "writer": writer,
                 "path": filepath,
-                "start_time": time.time(),
-                "frames": 0
+                "start_time": preroll_frames[0][0] if preroll_frames else now,
+                "frames": 0,
+                "size": (width, height),
+                "queue": queue.Queue(maxsize=RECORDING_QUEUE),
+                "stop": threading.Event(),
+                "camera_name": None,
             }
-            print(f"[AlertManager] Recording started for {camera_id}: {filepath}")
+            rec["thread"] = threading.Thread(target=self._record, args=(camera_id, rec, preroll_frames, now),
+                                             daemon=True, name=f"Recording_{camera_id}")
+            self.active_recordings[camera_id] = rec
+            rec["thread"].start()
+            print(f"[AlertManager] Recording started for {camera_id}: {filepath} "
+                  f"({now - rec['start_time']:.1f}s pre-roll)")
         except Exception as e:
             print(f"[AlertManager] Failed to start recording: {e}")
 
-    def write_frame(self, camera_id, frame):
+    def _record(self, camera_id, rec, preroll_frames, until):
+        """
+        Recording writer thread: pre-roll, then queued frames until stop_recording
+        sets rec["stop"] and the queue is empty. A write error ends the recording.
+        """
+        writer = rec["writer"]
+        try:
+            rec["frames"] += write_frames(preroll_frames, writer, rec["size"], RECORDING_FPS, until)
+            while True:
+                try:
+                    frame = rec["queue"].get(timeout=0.5)
+                except queue.Empty:
+                    if rec["stop"].is_set():
+                        break
+                    continue
+                if frame.shape[1::-1] != rec["size"]:
+                    # Evidence source changed resolution mid-recording (sub -> main stream)
+                    frame = cv2.resize(frame, rec["size"])
+                writer.write(frame)
+                rec["frames"] += 1
+        except Exception as e:
+            print(f"[AlertManager] Error writing recording: {e}")
+            # Nobody drains the queue any more: let pre-roll and new recordings resume
+            with self.falls_lock:
+                if self.active_recordings.get(camera_id) is rec:
+                    del self.active_recordings[camera_id]
+        finally:
+            writer.release()
+
+        duration = time.time() - rec["start_time"]
+        print(f"[AlertManager] Recording stopped for {rec['path']}. Duration: {duration:.1f}s")
+        if rec["camera_name"] is not None:
+            self._send_video_alert(rec["path"], rec["camera_name"], duration)
+
+    def _preroll(self, camera_id):
+        """The camera's pre-roll buffer, rebuilt when its settings change."""
+        params = (self._preroll_seconds(),
+                  int(float(self.settings.get("preroll_max_mb", 4)) * 1024 * 1024),
+                  float(self.settings.get("preroll_fps", 10)))
+        with self.preroll_lock:
+            buffer = self.prerolls.get(camera_id)
+            if buffer is None or (buffer.seconds, buffer.max_bytes, buffer.fps) != params:
+                buffer = PrerollBuffer(seconds=params[0], max_bytes=params[1], fps=params[2])
+                self.prerolls[camera_id] = buffer
+            return buffer
+
+    def _preroll_seconds(self):
+        seconds = self.settings.get("preroll_seconds")
+        if seconds is None:
+            # Long enough to show the fall itself: the alert fires min_duration after detection
+            seconds = float(self.settings.get("min_duration", 0)) + float(self.settings.get("preroll_margin", 3.0))
+        return float(seconds)
+
+    def buffer_frame(self, camera_id, frame, prepare=None):
+        """
+        Keep frame in the camera's pre-roll so the next recording starts a few
+        seconds before the alert. prepare(frame) runs on a copy, and only for
+        frames the buffer actually keeps (e.g. to draw the overlay).
+        """
+        if not self.settings.get("enabled") or not self._preroll_seconds() or frame is None:
+            return
         if camera_id in self.active_recordings:
+            return  # Frames go straight into the recording
+        buffer = self._preroll(camera_id)
+        if not buffer.due():
+            return
+        if prepare is not None:
+            frame = frame.copy()
+            prepare(frame)
+        buffer.push(frame)
+
+    def drop_preroll(self, camera_id):
+        with self.preroll_lock:
+            self.prerolls.pop(camera_id, None)
+
+    def is_recording(self, camera_id):
+        return camera_id in self.active_recordings
+
+    def write_frame(self, camera_id, frame):
+        rec = self.active_recordings.get(camera_id)
+        if rec is not None:
             try:
-                rec = self.active_recordings[camera_id]
-                rec["writer"].write(frame)
-                rec["frames"] += 1
-            except Exception as e:
-                print(f"Error writing frame: {e}")
+                # Copied: callers reuse their frame buffers
+                rec["queue"].put_nowait(frame.copy())
+            except queue.Full:
+                pass  # Writer thread behind: drop the frame rather than stall the vision loop
 
     def stop_recording(self, camera_id, camera_name="Cámara"):
-        if camera_id not in self.active_recordings:
+        with self.falls_lock:
+            rec = self.active_recordings.pop(camera_id, None)
+        if rec is None:
             return
 
-        rec = self.active_recordings.pop(camera_id)
-        try:
-            rec["writer"].release()
-            duration = time.time() - rec["start_time"]
-            print(f"[AlertManager] Recording stopped for {camera_id}. Duration: {duration:.1f}s")
-            
-            # Send via Telegram
-            self._send_video_alert(rec["path"], camera_name, duration)
-        except Exception as e:
-            print(f"[AlertManager] Error stopping recording: {e}")
+        # The writer thread drains the queue, finishes the file and sends it via Telegram
+        rec["camera_name"] = camera_name
+        rec["stop"].set()
 
     def _send_video_alert(self, filepath, camera_name, duration):
         threading.Thread(target=self._dispatch_video, args=(filepath, camera_name, duration)).start()
@@ -0,0 +1,313 @@
+import asyncio
+import threading
+import time
+
+import cv2
+import numpy as np
+
+BOUNDARY_HEADER = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n'
+WANTED_SLACK = 1.0  # Seconds a variant/thumbnail stays wanted beyond its client's frame interval
+
+
+def mjpeg_chunk(jpeg, seq=None):
+    # join() copies straight from the encoder's buffer: one allocation per chunk.
+    # seq (capture sequence number) lets clients match frames with /pose_feed messages.
+    header = BOUNDARY_HEADER if seq is None else (
+        b'--frame\r\nContent-Type: image/jpeg\r\nX-Frame-Seq: %d\r\n\r\n' % seq)
+    return b''.join((header, jpeg, b'\r\n'))
+
+
+_placeholder_chunk = None
+
+
+def placeholder_chunk():
+    """Black 640x360 frame shown while a camera is (re)connecting. Encoded once."""
+    global _placeholder_chunk
+    if _placeholder_chunk is None:
+        blank_frame = np.zeros((360, 640, 3), np.uint8)
+        ret, buffer = cv2.imencode('.jpg', blank_frame)
+        _placeholder_chunk = mjpeg_chunk(buffer) if ret else b''
+    return _placeholder_chunk
+
+
+class FrameHub:
+    """
+    Per-camera broadcast hub.
+    A single producer thread reads the camera, runs the vision pipeline and
+    encodes the JPEG once. Every /video_feed subscriber receives the same
+    pre-built multipart chunk, so CPU per camera does not grow with viewers
+    and AlertManager sees every processed frame exactly once.
+    """
+
+    def __init__(self, camera_id, stream, processor=None, idle_timeout=5.0, quality=None, overlay=None,
+                 max_fps=None, pace=None):
+        self.camera_id = camera_id
+        self.stream = stream
+        self.processor = processor  # callable(frame) -> frame (PoseService.process_frame)
+        # Pacing: the hub asks for a frame at most max_fps times per second, and
+        # with nobody watching only every pace() seconds (PoseService.frame_interval),
+        # so an on_demand stream skips the decode of every frame in between
+        self.max_fps = max_fps
+        self.pace = pace
+        # With overlay (PoseService.draw_overlay) the processor is called with
+        # draw=False and the hub draws only while some client wants drawn frames,
+        # after encoding the raw variants
+        self.overlay = overlay
+        self.overlay_clients = 0        # Drawn-mode aframes() subscribers
+        self.overlay_wanted_until = 0   # Drawn thumbnails (mosaic) wanted until then
+        self.idle_timeout = idle_timeout
+        self.encode_params = [cv2.IMWRITE_JPEG_QUALITY, quality] if quality else []
+
+        self.cond = threading.Condition()
+        self.seq = 0
+        self.frame = None   # Last processed frame (a pooled capture buffer: valid until the next one)
+        self.jpeg = None    # Encoded bytes of self.frame (zero-copy view into self.chunk)
+        self.chunk = None   # Multipart chunk ready to send
+
+        # Per-client variants: {(width, quality, raw): (seq, chunk)} for the current frame
+        # only, and the variants some client is waiting for (encoded once, shared by all)
+        self.variants = {}
+        self.variants_wanted = {}  # {(width, quality, raw): time until which a client wants it}
+        # Raw downscaled copies for compositing (mosaic): {width: (seq, image)}
+        self.thumbnails = {}
+        self.thumbnails_wanted = {}  # {width: wanted until}
+
+        self.subscribers = 0
+        self.async_waiters = set()  # {(loop, asyncio.Event)} of aframes() subscribers
+        self.last_unsubscribe = 0
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        with self.cond:
+            if self.running:
+                return self
+            self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True, name=f"Hub_{self.camera_id}")
+        self.thread.start()
+        return self
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+            self._wake_async()
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout=1.0)
+
+    def _publish(self, frame, chunk, jpeg=None, variants=None):
+        with self.cond:
+            self.frame = frame
+            self.jpeg = jpeg
+            self.chunk = chunk
+            self.seq += 1
+            # Encodes of the previous frame are stale
+            self.variants = {key: (self.seq, c) for key, c in (variants or {}).items()}
+            self.cond.notify_all()
+            self._wake_async()
+
+    def _wake_async(self):
+        # Called with self.cond held, from the producer thread
+        for loop, event in self.async_waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # Subscriber's loop already closed
+
+    def _is_idle(self):
+        if self.idle_timeout is None:
+            # Always-on worker (VisionSupervisor): keep analysing with no viewers
+            return False
+        return (self.subscribers == 0 and
+                time.time() - self.last_unsubscribe > self.idle_timeout)
+
+    def _interval(self):
+        # Called with self.cond held
+        interval = 1.0 / self.max_fps if self.max_fps else 0.0
+        if self.pace is not None and not self.subscribers and not self.thumbnails_wanted:
+            try:
+                interval = max(interval, self.pace())
+            except Exception as e:
+                print(f"Hub pacing error: {e}")
+        return interval
+
+    def _run(self):
+        last_seq = 0
+        last_read = 0.0
+
+        while self.running and self.stream.running:
+            with self.cond:
+                if self._is_idle():
+                    # Nobody watching: release the producer until the next subscriber
+                    self.running = False
+                    self.cond.notify_all()
+                    self._wake_async()
+                    break
+                # Not waiting in read_next meanwhile lets the capture thread grab without decoding
+                wait = last_read + self._interval() - time.time()
+                if wait > 0:
+                    self.cond.wait_for(lambda: not self.running, timeout=wait)
+                    continue
+            last_read = time.time()
+
+            # Sleeps until the capture thread delivers a frame we have not processed yet
+            success, frame, seq, _ = self.stream.read_next(last_seq, timeout=0.5)
+
+            if not success:
+                if not self.stream.connected:
+                    # Keep the HTTP stream alive with a placeholder while reconnecting
+                    self._publish(None, placeholder_chunk())
+                continue
+            last_seq = seq
+
+            if self.processor:
+                try:
+                    if self.overlay is not None:
+                        frame = self.processor(frame, seq=seq, draw=False)
+                    else:
+                        frame = self.processor(frame)
+                except Exception as e:
+                    print(f"Vision processing error: {e}")
+
+            now = time.time()
+            with self.cond:
+                self.variants_wanted = {k: t for k, t in self.variants_wanted.items() if t > now}
+                self.thumbnails_wanted = {k: t for k, t in self.thumbnails_wanted.items() if t > now}
+                draw = self.overlay is not None and (self.overlay_clients > 0 or now < self.overlay_wanted_until)
+                raw_keys = [k for k in self.variants_wanted if k[2]]
+                drawn_keys = [k for k in self.variants_wanted if not k[2]]
+                thumbs = list(self.thumbnails_wanted)
+
+            # Raw variants first, then the overlay is drawn in place for everyone else
+            variants = self._encode_variants(frame, raw_keys, seq)
+            if draw:
+                try:
+                    self.overlay(frame)
+                except Exception as e:
+                    print(f"Overlay error: {e}")
+
+            ret, buffer = cv2.imencode('.jpg', frame, self.encode_params)
+            if not ret:
+                continue
+            chunk = mjpeg_chunk(buffer, seq)
+            variants.update(self._encode_variants(frame, drawn_keys, seq))
+            self._publish(frame, chunk, memoryview(chunk)[len(chunk) - len(buffer) - 2:-2], variants)
+            self._make_thumbnails(frame, thumbs)
+
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+            self._wake_async()
+
+    @staticmethod
+    def _scaler(frame):
+        """Memoised downscale of frame by target width (the frame itself when not smaller)."""
+        h, w = frame.shape[:2]
+        resized = {}
+
+        def scaled(width):
+            if not width or width >= w:
+                return frame
+            if width not in resized:
+                resized[width] = cv2.resize(frame, (width, int(round(h * width / w))), interpolation=cv2.INTER_AREA)
+            return resized[width]
+        return scaled
+
+    def _encode_variants(self, frame, keys, seq):
+        """{key: chunk} for the requested (width, quality, raw) variants of this frame."""
+        chunks = {}
+        if not keys:
+            return chunks
+        scaled = self._scaler(frame)
+        for key in keys:
+            width, quality, _ = key
+            params = [cv2.IMWRITE_JPEG_QUALITY, quality] if quality else self.encode_params
+            ret, buffer = cv2.imencode('.jpg', scaled(width), params)
+            if ret:
+                chunks[key] = mjpeg_chunk(buffer, seq)
+        return chunks
+
+    def _make_thumbnails(self, frame, widths):
+        """Raw downscaled copies for compositing, built while this thread still owns the frame buffer."""
+        if not widths:
+            return
+        scaled = self._scaler(frame)
+        with self.cond:
+            seq = self.seq
+        for width in widths:
+            image = scaled(width)
+            # Thumbnails outlive this frame: never hand out the pooled buffer itself
+            image = image.copy() if image is frame else image
+            with self.cond:
+                self.thumbnails[width] = (seq, image)
+
+    def thumbnail(self, width, interval=0.0):
+        """
+        Latest (seq, image) downscaled to width px, or None until the next frame
+        produces it. interval is how often the caller asks, so slow callers keep
+        the thumbnail (and the overlay on it) wanted between their calls.
+        """
+        with self.cond:
+            self.thumbnails_wanted[width] = until = time.time() + interval + WANTED_SLACK
+            self.overlay_wanted_until = max(self.overlay_wanted_until, until)
+            return self.thumbnails.get(width)
+
+    async def aframes(self, width=None, quality=None, max_fps=None, raw=False):
+        """
+        Async generator of multipart chunks for one subscriber.
+        Waits on the event loop instead of a threadpool worker and always
+        yields the newest chunk: frames published while the client was still
+        sending the previous one are skipped, never queued.
+
+        width/quality select a variant encoded once per frame for every client
+        asking for the same one; max_fps caps this client's frame rate. raw
+        skips the server-side overlay (clients draw from /pose_feed).
+        """
+        key = (width, quality, bool(raw)) if (width or quality or raw) else None
+        min_interval = 1.0 / max_fps if max_fps else 0.0
+        event = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), event)
+        with self.cond:
+            self.subscribers += 1
+            if not raw:
+                self.overlay_clients += 1
+            self.async_waiters.add(waiter)
+        self.start()
+
+        last_seq = 0
+        last_sent = 0.0
+        try:
+            while True:
+                wait = last_sent + min_interval - time.time()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+
+                event.clear()
+                with self.cond:
+                    if not self.running:
+                        break
+                    seq, chunk = self.seq, self.chunk
+                    if key is not None and self.frame is not None:
+                        # Variant of the current frame, or ask the producer for it
+                        self.variants_wanted[key] = time.time() + min_interval + WANTED_SLACK
+                        cached = self.variants.get(key)
+                        if cached is None:
+                            chunk = None
+                        else:
+                            seq, chunk = cached
+                if seq == last_seq or chunk is None:
+                    try:
+                        await asyncio.wait_for(event.wait(), timeout=1.0)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                last_seq = seq
+                last_sent = time.time()
+                yield chunk
+        finally:
+            with self.cond:
+                self.async_waiters.discard(waiter)
+                if not raw:
+                    self.overlay_clients -= 1
+                self.subscribers -= 1
+                self.last_unsubscribe = time.time()
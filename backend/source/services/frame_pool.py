@@ -0,0 +1,43 @@
+import threading
+
+import numpy as np
+
+
+class FramePool:
+    """
+    Small set of preallocated frame buffers reused by the capture thread.
+
+    Decoding into a pooled buffer (VideoCapture.retrieve(image=buf)) avoids a
+    fresh multi-megabyte allocation per frame. Buffers are handed out with
+    acquire() and come back with release(); the pool reallocates itself only
+    when the stream's resolution changes.
+    """
+
+    def __init__(self, count=3):
+        self.count = count
+        self.shape = None
+        self.buffers = []
+        self.free = []
+        self.lock = threading.Lock()
+
+    def _allocate(self, shape, dtype):
+        self.shape = shape
+        self.buffers = [np.empty(shape, dtype) for _ in range(self.count)]
+        self.free = list(self.buffers)
+
+    def acquire(self, shape, dtype=np.uint8):
+        """A free buffer of `shape`, or None when every buffer is in use."""
+        with self.lock:
+            if shape != self.shape:
+                self._allocate(shape, dtype)
+            return self.free.pop() if self.free else None
+
+    def release(self, buf):
+        if buf is None:
+            return
+        with self.lock:
+            if self.owns(buf) and not any(b is buf for b in self.free):
+                self.free.append(buf)
+
+    def owns(self, buf):
+        return any(b is buf for b in self.buffers)
@@ -0,0 +1,58 @@
+import asyncio
+
+from starlette.responses import Response
+
+MJPEG_MEDIA_TYPE = "multipart/x-mixed-replace; boundary=frame"
+
+
+class MJPEGResponse(Response):
+    """
+    Async multipart/x-mixed-replace response fed by an async chunk iterator
+    (FrameHub.aframes()).
+
+    Runs entirely on the event loop, so viewers do not hold threadpool
+    workers. A client that cannot take a chunk within send_timeout seconds is
+    treated as dead and dropped; a client that disconnects cancels its stream
+    immediately. Slow-but-alive clients are handled by the iterator, which
+    skips to the newest frame instead of queueing.
+    """
+
+    media_type = MJPEG_MEDIA_TYPE
+
+    def __init__(self, chunks, send_timeout=5.0):
+        super().__init__(media_type=self.media_type, headers={"Cache-Control": "no-cache, no-store"})
+        # Endless body: drop the Content-Length: 0 that Response adds for an empty body
+        self.raw_headers = [(k, v) for k, v in self.raw_headers if k != b"content-length"]
+        self.chunks = chunks
+        self.send_timeout = send_timeout
+
+    async def _stream(self, send):
+        async for chunk in self.chunks:
+            await asyncio.wait_for(
+                send({"type": "http.response.body", "body": chunk, "more_body": True}),
+                timeout=self.send_timeout,
+            )
+
+    @staticmethod
+    async def _wait_disconnect(receive):
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+
+        stream = asyncio.ensure_future(self._stream(send))
+        disconnect = asyncio.ensure_future(self._wait_disconnect(receive))
+        try:
+            await asyncio.wait([stream, disconnect], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in (stream, disconnect):
+                task.cancel()
+            await asyncio.gather(stream, disconnect, return_exceptions=True)
+            await self.chunks.aclose()
+
+        if stream.done() and not stream.cancelled() and stream.exception() is None:
+            # Hub stopped: end the response cleanly
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
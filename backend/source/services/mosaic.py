@@ -0,0 +1,95 @@
+import math
+import time
+
+import cv2
+import numpy as np
+
+
+class MosaicStream:
+    """
+    Frame source that composes several cameras into one canvas.
+
+    Implements the read_next() contract of RTSPStream, so a regular FrameHub
+    serves it: one encode per composed frame for every dashboard viewer. The
+    canvas is preallocated and each tick only redraws the tiles whose camera
+    published a new frame; ticks are capped at `fps`.
+    """
+
+    def __init__(self, camera_ids, get_hub, tile_width=320, cols=None, fps=5.0, aspect=16 / 9):
+        self.camera_ids = [str(c) for c in camera_ids]
+        self.get_hub = get_hub  # callable(camera_id) -> FrameHub or None (hubs are rebuilt on config changes)
+        self.tile_width = int(tile_width)
+        self.tile_height = int(round(self.tile_width / aspect))
+        self.interval = 1.0 / max(float(fps or 5.0), 0.1)
+
+        n = max(1, len(self.camera_ids))
+        self.cols = max(1, min(int(cols), n)) if cols else int(math.ceil(math.sqrt(n)))
+        self.rows = int(math.ceil(n / self.cols))
+        self.canvas = np.zeros((self.rows * self.tile_height, self.cols * self.tile_width, 3), np.uint8)
+        self.tile_seq = [None] * n  # Frame seq drawn in each tile (-1: drawn as offline)
+
+        self.seq = 0
+        self.last_compose = 0
+        self.running = True
+        self.connected = True
+
+    def start(self):
+        self.running = True
+        return self
+
+    def stop(self):
+        self.running = False
+
+    def _tile(self, index):
+        row, col = divmod(index, self.cols)
+        y, x = row * self.tile_height, col * self.tile_width
+        return self.canvas[y:y + self.tile_height, x:x + self.tile_width]
+
+    def _draw_tile(self, index, image):
+        tile = self._tile(index)
+        tile[:] = 0
+        if image is not None:
+            # Letterbox: keep the camera's aspect ratio inside the tile
+            h, w = image.shape[:2]
+            scale = min(self.tile_width / w, self.tile_height / h)
+            tw, th = max(1, int(w * scale)), max(1, int(h * scale))
+            if (tw, th) != (w, h):
+                image = cv2.resize(image, (tw, th), interpolation=cv2.INTER_AREA)
+            y0, x0 = (self.tile_height - th) // 2, (self.tile_width - tw) // 2
+            tile[y0:y0 + th, x0:x0 + tw] = image
+        label = f"Cam {self.camera_ids[index]}" + ("" if image is not None else " - sin señal")
+        cv2.putText(tile, label, (8, 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1, cv2.LINE_AA)
+
+    def _compose(self):
+        """Redraw the tiles whose camera has a newer frame. Returns True if anything changed."""
+        changed = False
+        for i, camera_id in enumerate(self.camera_ids):
+            hub = self.get_hub(camera_id)
+            thumb = hub.thumbnail(self.tile_width, self.interval) if hub is not None and hub.running else None
+            if thumb is None:
+                if hub is None or not hub.running:
+                    if self.tile_seq[i] != -1:
+                        self._draw_tile(i, None)
+                        self.tile_seq[i] = -1
+                        changed = True
+                continue
+            seq, image = thumb
+            if seq != self.tile_seq[i]:
+                self._draw_tile(i, image)
+                self.tile_seq[i] = seq
+                changed = True
+        return changed
+
+    def read_next(self, after_seq=0, timeout=1.0):
+        deadline = time.time() + timeout
+        while self.running:
+            wait = self.last_compose + self.interval - time.time()
+            if wait > 0:
+                time.sleep(wait)
+            self.last_compose = time.time()
+            if self._compose() or self.seq == 0:
+                self.seq += 1
+                return True, self.canvas, self.seq, self.last_compose
+            if time.time() >= deadline:
+                break
+        return False, None, after_seq, None
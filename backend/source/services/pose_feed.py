@@ -0,0 +1,90 @@
+import asyncio
+import json
+import threading
+import time
+
+import numpy as np
+
+
+def pose_message(camera_id, seq, timestamp, detections, track_ids, track_postures, posture):
+    """
+    Compact JSON-ready description of one inference, in normalised full-frame
+    coordinates. kpts is flat [x, y, conf] * 17 per person.
+    """
+    people = []
+    if len(detections):
+        boxes = np.round(detections.boxes, 4).tolist()
+        kpts = np.round(np.concatenate([detections.keypoints, detections.keypoint_conf[..., None]], axis=-1), 3)
+        kpts = kpts.reshape(len(detections), -1).tolist()
+        ids = track_ids if len(track_ids) == len(detections) else [None] * len(detections)
+        for track_id, box, points in zip(ids, boxes, kpts):
+            people.append({
+                "id": track_id,
+                "posture": track_postures.get(track_id, "Desconocido"),
+                "box": box,
+                "kpts": points,
+            })
+    return {"camera": camera_id, "seq": seq, "ts": round(timestamp, 3), "posture": posture, "people": people}
+
+
+class PoseFeed:
+    """
+    Latest pose metadata of one camera for /pose_feed subscribers.
+    Messages are only serialised while someone listens, and a slow client
+    always gets the newest message rather than a backlog.
+    """
+
+    def __init__(self, camera_id):
+        self.camera_id = camera_id
+        self.cond = threading.Condition()
+        self.seq = 0
+        self.message = None   # Serialised SSE event
+        self.subscribers = 0
+        self.async_waiters = set()  # {(loop, asyncio.Event)}
+
+    def publish(self, seq, timestamp, detections, track_ids, track_postures, posture):
+        """Called by PoseService after each inference on capture frame seq."""
+        with self.cond:
+            if not self.subscribers:
+                return
+        message = pose_message(self.camera_id, seq, timestamp, detections, track_ids, track_postures, posture)
+        data = f"data: {json.dumps(message, separators=(',', ':'))}\n\n"
+        with self.cond:
+            self.message = data
+            self.seq += 1
+            for loop, event in self.async_waiters:
+                try:
+                    loop.call_soon_threadsafe(event.set)
+                except RuntimeError:
+                    pass  # Subscriber's loop already closed
+
+    async def messages(self, keepalive=15.0):
+        event = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), event)
+        with self.cond:
+            self.subscribers += 1
+            self.async_waiters.add(waiter)
+
+        last_seq = self.seq
+        last_sent = time.time()
+        try:
+            while True:
+                event.clear()
+                with self.cond:
+                    seq, message = self.seq, self.message
+                if seq != last_seq:
+                    last_seq = seq
+                    last_sent = time.time()
+                    yield message
+                    continue
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=1.0)
+                except asyncio.TimeoutError:
+                    if time.time() - last_sent > keepalive:
+                        # SSE comment keeps proxies and EventSource from timing out
+                        last_sent = time.time()
+                        yield ": keepalive\n\n"
+        finally:
+            with self.cond:
+                self.async_waiters.discard(waiter)
+                self.subscribers -= 1
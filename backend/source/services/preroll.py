@@ -0,0 +1,86 @@
+import collections
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+class PrerollBuffer:
+    """
+    Last `seconds` of one camera as JPEG bytes, for recordings that start
+    before the alert.
+
+    Frames are encoded at most `fps` times per second and kept in a deque of
+    (timestamp, jpeg). Anything older than `seconds` is evicted, and so are
+    the oldest frames whenever the total exceeds `max_bytes`, so memory per
+    camera never grows past the budget however busy the scene gets.
+    """
+
+    def __init__(self, seconds=5.0, max_bytes=4 * 1024 * 1024, fps=10.0, quality=70):
+        self.seconds = seconds
+        self.max_bytes = max_bytes
+        self.fps = fps
+        self.interval = 1.0 / fps if fps else 0.0
+        self.encode_params = [cv2.IMWRITE_JPEG_QUALITY, int(quality)]
+        self.frames = collections.deque()  # [(timestamp, jpeg bytes)]
+        self.bytes = 0
+        self.last_push = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.frames)
+
+    def due(self, now=None):
+        now = time.time() if now is None else now
+        return now - self.last_push >= self.interval
+
+    def push(self, frame, now=None):
+        """Encode and keep frame; returns False if it was skipped by the fps cap or did not encode."""
+        now = time.time() if now is None else now
+        if not self.due(now):
+            return False
+        self.last_push = now
+        ret, buffer = cv2.imencode('.jpg', frame, self.encode_params)
+        if not ret:
+            return False
+        jpeg = buffer.tobytes()
+        with self.lock:
+            self.frames.append((now, jpeg))
+            self.bytes += len(jpeg)
+            while self.frames and (self.bytes > self.max_bytes or now - self.frames[0][0] > self.seconds):
+                self.bytes -= len(self.frames.popleft()[1])
+        return True
+
+    def drain(self):
+        """Remove and return every buffered (timestamp, jpeg), oldest first."""
+        with self.lock:
+            frames, self.frames = list(self.frames), collections.deque()
+            self.bytes = 0
+        return frames
+
+    def write_to(self, writer, size, fps, until=None):
+        """Drain the buffer into a VideoWriter, see write_frames. Returns the number of frames written."""
+        return write_frames(self.drain(), writer, size, fps, until)
+
+
+def write_frames(frames, writer, size, fps, until=None):
+    """
+    Decode drained (timestamp, jpeg) frames into a VideoWriter opened at `fps`
+    and `size`, repeating each frame for as long as it was on screen (the last
+    one until `until`) so the pre-roll plays back in real time.
+    Returns the number of frames written.
+    """
+    until = time.time() if until is None else until
+    written = 0
+    for i, (ts, jpeg) in enumerate(frames):
+        image = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            continue
+        if image.shape[1::-1] != tuple(size):
+            image = cv2.resize(image, tuple(size))
+        end = frames[i + 1][0] if i + 1 < len(frames) else until
+        for _ in range(max(1, int(round((end - ts) * fps)))):
+            writer.write(image)
+            written += 1
+    return written
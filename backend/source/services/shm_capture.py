@@ -0,0 +1,291 @@
+import multiprocessing as mp
+import threading
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from source.services.frame_pool import FramePool
+
+# Control block (int64): global seq, connected flag, heartbeat (ms)
+CTRL_SEQ, CTRL_CONNECTED, CTRL_HEARTBEAT = 0, 1, 2
+CTRL_SIZE = 8
+# Per-slot header (int64): seq, height, width, capture time (us)
+SLOT_SEQ, SLOT_H, SLOT_W, SLOT_TS = 0, 1, 2, 3
+SLOT_HEADER = 4
+
+
+class SharedFrameRing:
+    """
+    Fixed-size ring of BGR frames in a multiprocessing.shared_memory block.
+
+    Layout: control block | per-slot headers | slot pixel data (max_shape each).
+    The writer marks a slot invalid (seq = -1) while copying into it and then
+    publishes the slot seq followed by the global seq, so readers never see a
+    half-written frame. Frames larger than max_shape are downscaled to fit.
+    """
+
+    def __init__(self, name=None, slots=4, max_shape=(1080, 1920, 3), create=False):
+        self.slots = slots
+        self.max_shape = tuple(max_shape)
+        frame_bytes = int(np.prod(self.max_shape))
+        header_bytes = (CTRL_SIZE + slots * SLOT_HEADER) * 8
+        self.data_offset = (header_bytes + 63) // 64 * 64
+
+        if create:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=self.data_offset + slots * frame_bytes)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self.owner = create
+
+        self.ctrl = np.ndarray((CTRL_SIZE,), np.int64, self.shm.buf, 0)
+        self.headers = np.ndarray((slots, SLOT_HEADER), np.int64, self.shm.buf, CTRL_SIZE * 8)
+        self.data = np.ndarray((slots,) + self.max_shape, np.uint8, self.shm.buf, self.data_offset)
+        if create:
+            self.ctrl[:] = 0
+            self.headers[:] = -1
+
+    @property
+    def seq(self):
+        return int(self.ctrl[CTRL_SEQ])
+
+    def write(self, frame, timestamp):
+        h, w = frame.shape[:2]
+        max_h, max_w = self.max_shape[:2]
+        if h > max_h or w > max_w:
+            scale = min(max_h / h, max_w / w)
+            frame = cv2.resize(frame, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+            h, w = frame.shape[:2]
+
+        seq = self.seq + 1
+        slot = seq % self.slots
+        header = self.headers[slot]
+        header[SLOT_SEQ] = -1
+        self.data[slot, :h, :w] = frame
+        header[SLOT_H], header[SLOT_W] = h, w
+        header[SLOT_TS] = int(timestamp * 1e6)
+        header[SLOT_SEQ] = seq
+        self.ctrl[CTRL_SEQ] = seq
+
+    def view(self, seq):
+        """Zero-copy view of frame seq, or None if it was already overwritten."""
+        header = self.headers[seq % self.slots]
+        if header[SLOT_SEQ] != seq:
+            return None, None
+        frame = self.data[seq % self.slots, :header[SLOT_H], :header[SLOT_W]]
+        return frame, header[SLOT_TS] / 1e6
+
+    def valid(self, seq):
+        """True while the slot holding seq has not been reused by the writer."""
+        return self.headers[seq % self.slots, SLOT_SEQ] == seq
+
+    def close(self):
+        # Drop the numpy views before closing, otherwise the buffer stays exported
+        self.ctrl = self.headers = self.data = None
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # A consumer still holds a frame view; the mapping goes away with it
+        if self.owner:
+            self.shm.unlink()
+
+
+def _capture_main(shm_name, slots, max_shape, source, name, decode, target_fps, stop_event, wanted, new_frame):
+    """
+    Capture process: run an RTSPStream and copy decoded frames into the ring.
+    wanted is set by the parent while a reader waits; new_frame is set after every write.
+    """
+    from camera_manager import RTSPStream
+
+    ring = SharedFrameRing(shm_name, slots=slots, max_shape=max_shape)
+    stream = RTSPStream(source, name=name, decode=decode, target_fps=target_fps).start()
+    last_seq = 0
+    try:
+        while not stop_event.is_set():
+            ring.ctrl[CTRL_HEARTBEAT] = int(time.time() * 1000)
+            ring.ctrl[CTRL_CONNECTED] = int(stream.connected)
+
+            # Only force a decode when the parent is waiting for a frame; sleep until it does
+            if decode != "all" and not wanted.is_set() and stream.seq <= last_seq:
+                wanted.wait(0.5)
+                continue
+
+            success, frame, seq, ts = stream.read_next(last_seq, timeout=0.2)
+            if success:
+                ring.write(frame, ts)
+                last_seq = seq
+                new_frame.set()
+    finally:
+        stream.stop()
+        ring.ctrl[CTRL_CONNECTED] = 0
+        ring.close()
+
+
+class ProcessStream:
+    """
+    Drop-in replacement for RTSPStream that captures in a child process.
+
+    Decoding happens outside this interpreter's GIL; frames arrive through a
+    SharedFrameRing. The writer reuses a slot `slots` frames later, so
+    read_next() copies the slot into a pooled buffer owned by the caller and
+    re-checks the slot seq after the copy (a torn copy is retried with the
+    newest frame). Readers block on a multiprocessing Event the child sets
+    after each frame, and the child only decodes on demand while the parent
+    sets another Event saying a reader waits. A watchdog thread restarts the
+    capture process if it exits or stops sending heartbeats. The child is started with the "spawn" method,
+    so it never inherits the server's threads or locks.
+    """
+
+    def __init__(self, source, name="Camera", decode="on_demand", target_fps=None,
+                 slots=4, max_shape=(1080, 1920, 3), heartbeat_timeout=10.0):
+        self.source = source
+        self.name = name
+        self.decode = decode
+        self.target_fps = target_fps
+        self.slots = slots
+        self.max_shape = tuple(max_shape)
+        self.heartbeat_timeout = heartbeat_timeout
+
+        self.ring = None
+        self.process = None
+        self.stop_event = None
+        self.wanted = None     # Set while a read_next() waits (child decodes on demand)
+        self.new_frame = None  # Set by the child after each frame it writes
+        self.waiters = 0
+        self.restarts = 0
+        self.running = False
+        self.lock = threading.Lock()  # Guards waiters and the wanted event
+        self.watchdog = None
+        self.pool = FramePool(count=2)
+        self.leased = None  # Buffer last returned by read_next(), valid until its next call
+
+    @property
+    def connected(self):
+        return self.ring is not None and bool(self.ring.ctrl[CTRL_CONNECTED])
+
+    @property
+    def seq(self):
+        return self.ring.seq if self.ring is not None else 0
+
+    def start(self):
+        if self.running:
+            return self
+        self.ring = SharedFrameRing(slots=self.slots, max_shape=self.max_shape, create=True)
+        self.running = True
+        self._spawn()
+        self.watchdog = threading.Thread(target=self._watch, daemon=True, name=f"Watchdog_{self.name}")
+        self.watchdog.start()
+        return self
+
+    def _spawn(self):
+        ctx = mp.get_context("spawn")
+        self.stop_event = ctx.Event()
+        with self.lock:
+            self.wanted = ctx.Event()
+            if self.waiters:
+                self.wanted.set()
+        self.new_frame = ctx.Event()
+        self.ring.ctrl[CTRL_HEARTBEAT] = int(time.time() * 1000)
+        self.process = ctx.Process(
+            target=_capture_main,
+            args=(self.ring.name, self.slots, self.max_shape, self.source, self.name,
+                  self.decode, self.target_fps, self.stop_event, self.wanted, self.new_frame),
+            daemon=True,
+            name=f"Capture_{self.name}",
+        )
+        self.process.start()
+
+    def _terminate(self):
+        if self.process is None:
+            return
+        self.stop_event.set()
+        self.process.join(timeout=2.0)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout=1.0)
+        self.process = None
+
+    def _watch(self):
+        while self.running:
+            time.sleep(1.0)
+            if not self.running:
+                break
+            heartbeat_age = time.time() - self.ring.ctrl[CTRL_HEARTBEAT] / 1000.0
+            if self.process.is_alive() and heartbeat_age < self.heartbeat_timeout:
+                continue
+            print(f"[CAM] Capture process for {self.name} died (exit {self.process.exitcode}). Restarting...")
+            self._terminate()
+            self.ring.ctrl[CTRL_CONNECTED] = 0
+            self.restarts += 1
+            if self.running:
+                self._spawn()
+
+    def _copy(self, ring, seq, pool=None):
+        """Copy of frame seq, or (None, None) if the writer reused its slot before or during the copy."""
+        view, ts = ring.view(seq)
+        if view is None:
+            return None, None
+        out = pool.acquire(view.shape) if pool is not None else None
+        if out is None:
+            out = np.empty(view.shape, view.dtype)
+        np.copyto(out, view)
+        if not ring.valid(seq):
+            if pool is not None:
+                pool.release(out)
+            return None, None
+        return out, ts
+
+    def read(self):
+        ring = self.ring
+        if ring is None or ring.seq == 0:
+            return False, None
+        frame, _ = self._copy(ring, ring.seq)
+        return frame is not None, frame
+
+    def read_next(self, after_seq=0, timeout=1.0):
+        """
+        Same contract as RTSPStream.read_next: the frame is a pooled buffer the
+        caller may draw on, recycled on the caller's next read_next().
+        """
+        ring = self.ring
+        if ring is None:
+            return False, None, after_seq, None
+        deadline = time.time() + timeout
+        with self.lock:
+            self.waiters += 1
+            self.wanted.set()
+        try:
+            while self.running:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                # Cleared before checking the seq, so a frame written after the check still wakes us
+                new_frame = self.new_frame
+                new_frame.clear()
+                seq = ring.seq
+                if seq > after_seq:
+                    self.pool.release(self.leased)
+                    self.leased, ts = self._copy(ring, seq, self.pool)
+                    if self.leased is not None:
+                        return True, self.leased, seq, ts
+                    continue  # Torn copy: the writer lapped us, take the newest frame
+                new_frame.wait(remaining)
+        finally:
+            with self.lock:
+                self.waiters -= 1
+                if not self.waiters:
+                    self.wanted.clear()
+        return False, None, after_seq, None
+
+    def stop(self):
+        self.running = False
+        if self.new_frame is not None:
+            self.new_frame.set()  # Wake readers
+        if self.watchdog and self.watchdog is not threading.current_thread():
+            self.watchdog.join(timeout=2.0)
+        self._terminate()
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
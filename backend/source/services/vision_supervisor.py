@@ -0,0 +1,241 @@
+import threading
+import time
+
+from camera_manager import RTSPStream
+from source.vision.pose_service import PoseService
+from source.vision.batch_scheduler import BatchScheduler
+from source.vision.model_registry import get_model, DEFAULT_POSE_MODEL
+from source.services.frame_hub import FrameHub
+from source.services.shm_capture import ProcessStream
+from source.services.mosaic import MosaicStream
+from source.services.pose_feed import PoseFeed
+from source.analysis.keypoint_trace import TraceWriter, DEFAULT_TRACE_DIR
+
+# Mosaic parameters are snapped to these so clients cannot create a hub per value
+MOSAIC_TILE_WIDTHS = (160, 240, 320, 480, 640)
+MOSAIC_FPS = (1.0, 2.0, 5.0, 10.0, 15.0)
+MOSAIC_QUALITIES = (50, 70, 85)
+MOSAIC_EVICT_AFTER = 60.0  # Seconds a stopped mosaic hub is kept for reuse
+
+
+def _nearest(value, choices):
+    return min(choices, key=lambda c: abs(c - value))
+
+
+class VisionSupervisor:
+    """
+    Owns one capture -> inference -> alert worker per enabled camera.
+    Workers run whether or not a browser is attached; /video_feed only
+    subscribes to the worker's FrameHub.
+    """
+
+    def __init__(self, alert_manager=None, settings=None):
+        self.alert_manager = alert_manager
+        self.settings = settings or {}  # "vision" section of settings.json
+        self.lock = threading.RLock()
+        self.scheduler = None
+
+        self.streams = {}        # {id: RTSPStream}
+        self.pose_services = {}  # {id: PoseService}
+        self.hubs = {}           # {id: FrameHub}
+        self.configs = {}        # {id: camera config}
+        self.pose_feeds = {}     # {id: PoseFeed}, kept across worker rebuilds so subscribers survive
+        self.mosaics = {}        # {(ids, tile_width, cols, fps, quality): FrameHub over a MosaicStream}
+
+    @staticmethod
+    def _resolve_source(config, key="source"):
+        src = config[key]
+        # Handle Integer indices for webcams vs Strings for RTSP
+        if isinstance(src, str) and src.isdigit():
+            src = int(src)
+        return src
+
+    def _get_scheduler(self):
+        """Shared cross-camera BatchScheduler, or None when batching is disabled."""
+        if not self.settings.get("batching", True):
+            return None
+        if self.scheduler is None:
+            try:
+                model = get_model(self.settings.get("model", DEFAULT_POSE_MODEL),
+                                  device=self.settings.get("device", "cpu"),
+                                  imgsz=self.settings.get("imgsz", 640),
+                                  backend=self.settings.get("backend", "torch"),
+                                  int8_data=self.settings.get("int8_data"))
+            except Exception as e:
+                print(f"[Supervisor] Batching disabled, model unavailable: {e}")
+                return None
+            self.scheduler = BatchScheduler(
+                model,
+                max_batch=self.settings.get("max_batch", 8),
+                window=self.settings.get("batch_window_ms", 20) / 1000.0,
+                fairness=self.settings.get("batch_fairness", "round_robin"),
+            ).start()
+        return self.scheduler
+
+    def _camera_settings(self, config):
+        """Global vision settings overridden by the camera's own "vision" block."""
+        merged = dict(self.settings)
+        merged.update(config.get("vision", {}))
+        merged["zones"] = config.get("zones", [])
+        return merged
+
+    def start_camera(self, config):
+        camera_id = str(config["id"])
+        with self.lock:
+            hub = self.hubs.get(camera_id)
+            if hub and hub.running and self.configs.get(camera_id) == config:
+                return hub
+
+            # Config changed or worker died: rebuild it from scratch
+            self.stop_camera(camera_id)
+
+            print(f"[Supervisor] Starting worker for Cam {camera_id}")
+            settings = self._camera_settings(config)
+            stream_cls = RTSPStream
+            stream_kwargs = {}
+            if settings.get("capture_process", False):
+                # Decode in a child process, frames shared through a shared-memory ring
+                max_w, max_h = settings.get("capture_max_size", [1920, 1080])
+                stream_cls = ProcessStream
+                stream_kwargs = {"slots": settings.get("capture_ring_slots", 4), "max_shape": (max_h, max_w, 3)}
+            # With a sub-stream, analysis and preview run on it and the main stream
+            # is only opened by PoseService when an alert needs full resolution
+            sub_source = config.get("sub_source")
+            stream = stream_cls(self._resolve_source(config, "sub_source" if sub_source else "source"),
+                                name=f"Cam_{camera_id}",
+                                decode=settings.get("decode", "on_demand"),
+                                target_fps=settings.get("capture_fps"), **stream_kwargs)
+            stream.start()
+
+            evidence_stream = None
+            if sub_source:
+                evidence_stream = RTSPStream(self._resolve_source(config), name=f"Cam_{camera_id}_main", pool_size=0)
+
+            trace_writer = None
+            if self.settings.get("traces", True):
+                trace_writer = TraceWriter(camera_id, root=self.settings.get("trace_dir", DEFAULT_TRACE_DIR),
+                                           max_days=self.settings.get("trace_days", 7))
+
+            service = PoseService(
+                camera_id=camera_id,
+                alert_manager=self.alert_manager,
+                model_path=self.settings.get("model", DEFAULT_POSE_MODEL),
+                device=self.settings.get("device", "cpu"),
+                imgsz=self.settings.get("imgsz", 640),
+                backend=self.settings.get("backend", "torch"),
+                scheduler=self._get_scheduler(),
+                settings=settings,
+                trace_writer=trace_writer,
+                evidence_stream=evidence_stream,
+                pose_feed=self.get_pose_feed(camera_id),
+            )
+            hub = FrameHub(camera_id, stream, processor=service.process_frame, idle_timeout=None,
+                           overlay=service.draw_overlay, max_fps=settings.get("preview_fps", 15),
+                           pace=service.frame_interval)
+            hub.start()
+
+            self.streams[camera_id] = stream
+            self.pose_services[camera_id] = service
+            self.hubs[camera_id] = hub
+            self.configs[camera_id] = config
+            return hub
+
+    def stop_camera(self, camera_id):
+        camera_id = str(camera_id)
+        with self.lock:
+            hub = self.hubs.pop(camera_id, None)
+            stream = self.streams.pop(camera_id, None)
+            service = self.pose_services.pop(camera_id, None)
+            self.configs.pop(camera_id, None)
+
+        if hub is None and stream is None and service is None:
+            return
+
+        print(f"[Supervisor] Stopping worker for Cam {camera_id}")
+        if hub:
+            hub.stop()
+        if stream:
+            stream.stop()
+        if service:
+            service.close()
+
+    def sync(self, cameras):
+        """Start workers for enabled cameras and stop the rest."""
+        wanted = {str(c["id"]): c for c in cameras if c.get("enabled", True)}
+
+        with self.lock:
+            for camera_id in list(self.hubs.keys()):
+                if camera_id not in wanted:
+                    self.stop_camera(camera_id)
+
+            for config in wanted.values():
+                try:
+                    self.start_camera(config)
+                except Exception as e:
+                    print(f"[Supervisor] Failed to start Cam {config.get('id')}: {e}")
+
+    def get_hub(self, camera_id):
+        with self.lock:
+            return self.hubs.get(str(camera_id))
+
+    def get_pose_feed(self, camera_id):
+        with self.lock:
+            camera_id = str(camera_id)
+            if camera_id not in self.pose_feeds:
+                self.pose_feeds[camera_id] = PoseFeed(camera_id)
+            return self.pose_feeds[camera_id]
+
+    def get_mosaic(self, camera_ids=None, tile_width=320, cols=None, fps=5.0, quality=70):
+        """
+        Shared mosaic hub for this camera selection; it stops itself when nobody
+        watches. Unknown cameras are dropped, cols is clamped to 1..len(ids) and
+        the other parameters are snapped to a few fixed values.
+        """
+        with self.lock:
+            self._evict_mosaics()
+            camera_ids = [str(c) for c in (camera_ids or []) if str(c) in self.hubs]
+            if not camera_ids:
+                camera_ids = sorted(self.hubs, key=lambda c: (len(c), c))
+            camera_ids = list(dict.fromkeys(camera_ids))
+            cols = max(1, min(int(cols), len(camera_ids))) if cols else None
+            tile_width = _nearest(tile_width, MOSAIC_TILE_WIDTHS)
+            fps = _nearest(fps, MOSAIC_FPS)
+            quality = _nearest(quality, MOSAIC_QUALITIES)
+
+            key = (tuple(camera_ids), tile_width, cols, fps, quality)
+            hub = self.mosaics.get(key)
+            if hub is None:
+                stream = MosaicStream(key[0], self.get_hub, tile_width=tile_width, cols=cols, fps=fps)
+                hub = FrameHub(f"mosaic_{len(self.mosaics)}", stream, idle_timeout=5.0, quality=quality)
+                self.mosaics[key] = hub
+            return hub
+
+    def _evict_mosaics(self):
+        """Forget mosaic hubs that stopped (no viewers) more than MOSAIC_EVICT_AFTER seconds ago."""
+        now = time.time()
+        for key, hub in list(self.mosaics.items()):
+            if hub.thread is not None and not hub.running and now - hub.last_unsubscribe > MOSAIC_EVICT_AFTER:
+                del self.mosaics[key]
+
+    def active_count(self):
+        with self.lock:
+            return sum(1 for stream in self.streams.values() if stream.running)
+
+    def inference_stats(self):
+        if self.scheduler is None:
+            return None
+        return self.scheduler.stats()
+
+    def stop_all(self):
+        with self.lock:
+            camera_ids = list(self.hubs.keys())
+        for camera_id in camera_ids:
+            self.stop_camera(camera_id)
+        with self.lock:
+            mosaics, self.mosaics = list(self.mosaics.values()), {}
+        for hub in mosaics:
+            hub.stop()
+            hub.stream.stop()
+        if self.scheduler:
+            self.scheduler.stop()
+            self.scheduler = None
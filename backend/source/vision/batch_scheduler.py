@@ -0,0 +1,173 @@
+import threading
+import time
+
+
+class BatchScheduler:
+    """
+    Cross-camera batched inference.
+    Each PoseService submits its latest frame, or one crop per detection zone
+    (a newer submission replaces an older pending one). A worker thread waits
+    at most `window` seconds for more cameras to submit, runs a single
+    batched forward pass over up to `max_batch` frames and hands the results
+    back to each camera's callback as a list, in submission order.
+
+    fairness:
+        "round_robin"  - rotate the starting camera so nobody starves when
+                         more than max_batch cameras are pending.
+        "oldest_first" - serve the frames that have waited longest.
+    """
+
+    def __init__(self, model, max_batch=8, window=0.02, fairness="round_robin", conf=0.5):
+        self.model = model
+        self.max_batch = max(1, int(max_batch))
+        self.window = window
+        self.fairness = fairness
+        self.conf = conf
+
+        self.cond = threading.Condition()
+        self.pending = {}   # {camera_id: ([frames], callback, submit_time)}
+        self.order = []     # Camera ids in round-robin order
+        self.rr_index = 0
+
+        self.running = False
+        self.thread = None
+
+        # Throughput stats
+        self.batches = 0
+        self.frames = 0
+        self.busy_time = 0.0
+        self.wait_time = 0.0
+        self.started_at = None
+
+    def start(self):
+        with self.cond:
+            if self.running:
+                return self
+            self.running = True
+            self.started_at = time.time()
+        self.thread = threading.Thread(target=self._run, daemon=True, name="BatchScheduler")
+        self.thread.start()
+        return self
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.pending.clear()
+            self.cond.notify_all()
+        if self.thread:
+            self.thread.join(timeout=2.0)
+
+    def submit(self, camera_id, frames, callback):
+        """Queue the latest frame (or list of crops) for camera_id. Returns False if it replaced a pending one."""
+        if not isinstance(frames, list):
+            frames = [frames]
+        with self.cond:
+            replaced = camera_id in self.pending
+            self.pending[camera_id] = (frames, callback, time.time())
+            if camera_id not in self.order:
+                self.order.append(camera_id)
+            self.cond.notify_all()
+            return not replaced
+
+    def is_pending(self, camera_id):
+        with self.cond:
+            return camera_id in self.pending
+
+    def remove(self, camera_id):
+        with self.cond:
+            self.pending.pop(camera_id, None)
+            if camera_id in self.order:
+                self.order.remove(camera_id)
+                self.rr_index = 0
+
+    def _pending_frames(self):
+        return sum(len(item[0]) for item in self.pending.values())
+
+    def _select(self):
+        """Pick pending cameras (up to max_batch frames) according to the fairness policy."""
+        if self.fairness == "oldest_first":
+            ids = sorted(self.pending, key=lambda cid: self.pending[cid][2])
+        else:
+            n = len(self.order)
+            start = self.rr_index % n if n else 0
+            rotated = self.order[start:] + self.order[:start]
+            ids = [cid for cid in rotated if cid in self.pending]
+
+        selected = []
+        count = 0
+        for cid in ids:
+            n = len(self.pending[cid][0])
+            # Always take at least one camera, even if it alone exceeds max_batch
+            if selected and count + n > self.max_batch:
+                break
+            selected.append(cid)
+            count += n
+        ids = selected
+
+        if ids and self.fairness != "oldest_first":
+            # Next batch starts right after the last camera served
+            self.rr_index = (self.order.index(ids[-1]) + 1) % len(self.order)
+        return ids
+
+    def _run(self):
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: self.pending or not self.running)
+                if not self.running:
+                    return
+
+                # Collection window: wait for more cameras unless the batch is full
+                deadline = time.time() + self.window
+                while self._pending_frames() < self.max_batch and self.running:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    self.cond.wait(remaining)
+                if not self.running:
+                    return
+
+                ids = self._select()
+                batch = [(cid,) + self.pending.pop(cid) for cid in ids]
+
+            if not batch:
+                continue
+
+            frames = [frame for item in batch for frame in item[1]]
+            start = time.time()
+            try:
+                results = list(self.model(frames, verbose=False, conf=self.conf))
+            except Exception as e:
+                print(f"[BatchScheduler] Inference error: {e}")
+                results = None
+            elapsed = time.time() - start
+
+            self.batches += 1
+            self.frames += len(frames)
+            self.busy_time += elapsed
+            self.wait_time += sum((start - item[3]) * len(item[1]) for item in batch)
+
+            if results is None:
+                continue
+
+            offset = 0
+            for camera_id, camera_frames, callback, _ in batch:
+                camera_results = results[offset:offset + len(camera_frames)]
+                offset += len(camera_frames)
+                try:
+                    callback(camera_results)
+                except Exception as e:
+                    print(f"[BatchScheduler] Callback error for Cam {camera_id}: {e}")
+
+    def stats(self):
+        uptime = time.time() - self.started_at if self.started_at else 0
+        return {
+            "batches": self.batches,
+            "frames": self.frames,
+            "avg_batch": round(self.frames / self.batches, 2) if self.batches else 0,
+            "fps": round(self.frames / uptime, 2) if uptime > 0 else 0,
+            "avg_batch_ms": round(1000 * self.busy_time / self.batches, 1) if self.batches else 0,
+            "avg_queue_ms": round(1000 * self.wait_time / self.frames, 1) if self.frames else 0,
+            "max_batch": self.max_batch,
+            "window_ms": round(self.window * 1000, 1),
+            "fairness": self.fairness,
+        }
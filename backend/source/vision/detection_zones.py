@@ -0,0 +1,93 @@
+import cv2
+import numpy as np
+
+
+class DetectionZones:
+    """
+    Per-camera detection zones stored in the camera config:
+
+        "zones": [
+            {"name": "Cama", "points": [[0.10, 0.20], [0.55, 0.20], [0.55, 0.90], [0.10, 0.90]]},
+            {"name": "Puerta", "rect": [0.70, 0.00, 1.00, 1.00]}
+        ]
+
+    Coordinates are normalised (0..1). crop() returns one crop per zone (its
+    bounding rectangle, with pixels outside a polygon blacked out) so the
+    model only sees the area we care about.
+    """
+
+    def __init__(self, zones=None, min_size=32):
+        self.zones = []
+        for zone in zones or []:
+            points = self._zone_points(zone)
+            if points is not None:
+                self.zones.append({"name": zone.get("name", ""), "points": points, "polygon": "points" in zone})
+        self.min_size = min_size
+
+        # Pixel geometry is cached per frame size
+        self._shape = None
+        self._regions = []
+        self._masks = []
+
+    def __bool__(self):
+        return bool(self.zones)
+
+    @staticmethod
+    def _zone_points(zone):
+        if "points" in zone and len(zone["points"]) >= 3:
+            pts = np.array(zone["points"], np.float32)
+        elif "rect" in zone and len(zone["rect"]) == 4:
+            x1, y1, x2, y2 = zone["rect"]
+            pts = np.array([[x1, y1], [x2, y1], [x2, y2], [x1, y2]], np.float32)
+        else:
+            return None
+        return np.clip(pts, 0.0, 1.0)
+
+    def _build(self, shape):
+        h, w = shape[:2]
+        self._shape = shape[:2]
+        self._regions = []
+        self._masks = []
+
+        for zone in self.zones:
+            pixel_pts = np.round(zone["points"] * np.array([w, h], np.float32)).astype(np.int32)
+            x0, y0 = pixel_pts.min(axis=0)
+            x1, y1 = pixel_pts.max(axis=0)
+            x0, y0 = max(0, int(x0)), max(0, int(y0))
+            x1, y1 = min(w, int(x1)), min(h, int(y1))
+            if x1 - x0 < self.min_size or y1 - y0 < self.min_size:
+                continue
+
+            mask = None
+            if zone["polygon"]:
+                mask = np.zeros((y1 - y0, x1 - x0), np.uint8)
+                cv2.fillPoly(mask, [pixel_pts - np.array([x0, y0], np.int32)], 255)
+
+            self._regions.append((x0, y0, x1, y1))
+            self._masks.append(mask)
+
+    def regions(self, shape):
+        if self._shape != shape[:2]:
+            self._build(shape)
+        return self._regions
+
+    def crop(self, frame):
+        """Return ([crop, ...], [(x0, y0, x1, y1), ...]) for every zone."""
+        regions = self.regions(frame.shape)
+        crops = []
+        for (x0, y0, x1, y1), mask in zip(regions, self._masks):
+            crop = frame[y0:y1, x0:x1]
+            if mask is not None:
+                crop = cv2.bitwise_and(crop, crop, mask=mask)
+            else:
+                crop = crop.copy()
+            crops.append(crop)
+        return crops, list(regions)
+
+    def draw(self, frame, color=(148, 163, 184)):
+        """Thin outline of each zone on the outgoing frame."""
+        h, w = frame.shape[:2]
+        for zone in self.zones:
+            pixel_pts = np.round(zone["points"] * np.array([w, h], np.float32)).astype(np.int32)
+            cv2.polylines(frame, [pixel_pts], True, color, 1, cv2.LINE_AA)
+        return frame
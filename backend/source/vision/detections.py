@@ -0,0 +1,96 @@
+import numpy as np
+
+NUM_KEYPOINTS = 17  # COCO keypoints produced by YOLOv8-pose
+
+
+class Detections:
+    """
+    Pose output for one frame in full-frame normalised coordinates, independent
+    of the inference backend or of zone cropping.
+
+        keypoints      (N, 17, 2) float32, x/y in 0..1 of the full frame
+        keypoint_conf  (N, 17)    float32
+        boxes          (N, 4)     float32, normalised xyxy
+        scores         (N,)       float32
+    """
+
+    __slots__ = ("keypoints", "keypoint_conf", "boxes", "scores")
+
+    def __init__(self, keypoints, keypoint_conf, boxes, scores):
+        self.keypoints = keypoints
+        self.keypoint_conf = keypoint_conf
+        self.boxes = boxes
+        self.scores = scores
+
+    def __len__(self):
+        return len(self.keypoints)
+
+    @classmethod
+    def empty(cls):
+        return cls(
+            np.zeros((0, NUM_KEYPOINTS, 2), np.float32),
+            np.zeros((0, NUM_KEYPOINTS), np.float32),
+            np.zeros((0, 4), np.float32),
+            np.zeros((0,), np.float32),
+        )
+
+    @staticmethod
+    def _numpy(tensor):
+        if hasattr(tensor, "cpu"):
+            tensor = tensor.cpu()
+        if hasattr(tensor, "numpy"):
+            tensor = tensor.numpy()
+        return np.asarray(tensor, dtype=np.float32)
+
+    @classmethod
+    def from_results(cls, results, regions=None, frame_shape=None):
+        """
+        Build from Ultralytics Results.
+        regions[i] is the (x0, y0, x1, y1) pixel crop that produced results[i]
+        (None for a full-frame result); frame_shape is the full frame's shape.
+        """
+        if regions is None:
+            regions = [None] * len(results)
+
+        keypoints, keypoint_conf, boxes, scores = [], [], [], []
+        for result, region in zip(results, regions):
+            if result is None or result.keypoints is None or len(result.keypoints) == 0:
+                continue
+            if result.keypoints.xy.shape[1] < NUM_KEYPOINTS:
+                continue
+
+            n = len(result.keypoints)
+            conf = result.keypoints.conf
+            kconf = cls._numpy(conf) if conf is not None else np.ones((n, NUM_KEYPOINTS), np.float32)
+            box_xyxy = cls._numpy(result.boxes.xyxy) if result.boxes is not None else np.zeros((n, 4), np.float32)
+            box_conf = cls._numpy(result.boxes.conf) if result.boxes is not None else np.ones((n,), np.float32)
+
+            if region is None:
+                kpts = cls._numpy(result.keypoints.xyn)
+                h, w = result.orig_shape[:2]
+                box_xyxy = box_xyxy / np.array([w, h, w, h], np.float32)
+            else:
+                # Crop pixel coordinates -> full-frame normalised coordinates
+                x0, y0 = region[0], region[1]
+                h, w = frame_shape[:2]
+                scale = np.array([w, h], np.float32)
+                raw = cls._numpy(result.keypoints.xy)
+                kpts = (raw + np.array([x0, y0], np.float32)) / scale
+                # Ultralytics zeroes keypoints it could not see; keep them at 0
+                kpts[(raw == 0).all(axis=-1)] = 0
+                box_xyxy = (box_xyxy + np.array([x0, y0, x0, y0], np.float32)) / np.tile(scale, 2)
+
+            keypoints.append(kpts[:, :NUM_KEYPOINTS])
+            keypoint_conf.append(kconf[:, :NUM_KEYPOINTS])
+            boxes.append(box_xyxy)
+            scores.append(box_conf)
+
+        if not keypoints:
+            return cls.empty()
+
+        return cls(
+            np.concatenate(keypoints),
+            np.concatenate(keypoint_conf),
+            np.concatenate(boxes),
+            np.concatenate(scores),
+        )
@@ -1,121 +1,68 @@
 import time
-from collections import deque
+
+import numpy as np
+
+try:
+    from .fall_engine import FallEngine, POSTURES, EVENTS, FALL_STAGES
+except ImportError:
+    from fall_engine import FallEngine, POSTURES, EVENTS, FALL_STAGES
+
+# Índices COCO de los landmarks que usa el clasificador
+LANDMARK_INDEX = {
+    "left_shoulder": 5, "right_shoulder": 6,
+    "left_hip": 11, "right_hip": 12,
+    "left_knee": 13, "right_knee": 14,
+    "left_ankle": 15, "right_ankle": 16,
+}
 
 
 class FallDetector:
-    def __init__(self):
-        # Suavizado temporal
-        self.knee_hip_hist = deque(maxlen=9)
-        self.body_height_hist = deque(maxlen=9)
-        self.shoulder_ankle_hist = deque(maxlen=9)
-
-        # Estado visual estable
-        self.last_state = None
-        self.pending_state = None
-        self.pending_since = None
-        self.state_delay = 1.0  # segundos para cambiar estado
-
-        # Caída (2 etapas)
-        self.fall_state = None          # None | "Posible" | "Confirmada"
-        self.fall_start_time = None
-        self.confirm_time = 5.0         # segundos en el suelo
+    """
+    Detector escalar (una persona). Envoltorio fino sobre FallEngine, que
+    implementa el suavizado, el retardo de estado y la caída en dos etapas
+    con arrays de NumPy para muchas personas a la vez.
+    """
+
+    def __init__(self, clock=time.time, **params):
+        # clock: reloj inyectable (p. ej. marcas de tiempo de un vídeo grabado)
+        self.clock = clock
+        self.engine = FallEngine(capacity=1, **params)
+        self.slot = self.engine.allocate(0)
 
         # Debug
         self.debug = False
 
-    def smooth(self, value, hist):
-        hist.append(value)
-        return sum(hist) / len(hist)
+    # Estado visual estable
+    @property
+    def last_state(self):
+        state = self.engine.last_state[self.slot]
+        return POSTURES[state] if state >= 0 else None
+
+    # Caída (2 etapas): None | "Posible" | "Confirmada"
+    @property
+    def fall_state(self):
+        return FALL_STAGES[self.engine.fall_state[self.slot]]
+
+    @property
+    def fall_start_time(self):
+        start = self.engine.fall_start[self.slot]
+        return None if np.isnan(start) else float(start)
+
 
-    
     # CLASIFICADOR DE POSTURA (TOP-DOWN)
-    
+
     def classify_posture(self, lm):
+        kpts = np.zeros((1, 17, 2), np.float64)
+        for name, idx in LANDMARK_INDEX.items():
+            kpts[0, idx] = lm[name]
 
-        # Landmarks
-        ls = lm["left_shoulder"]
-        rs = lm["right_shoulder"]
-        lh = lm["left_hip"]
-        rh = lm["right_hip"]
-        lk = lm["left_knee"]
-        rk = lm["right_knee"]
-        la = lm["left_ankle"]
-        ra = lm["right_ankle"]
-
-        # Promedios
-        shoulder_y = (ls[1] + rs[1]) / 2
-        hip_y = (lh[1] + rh[1]) / 2
-        knee_y = max(lk[1], rk[1])
-        ankle_y = max(la[1], ra[1])
-
-        # Métricas TOP-DOWN
-        knee_hip = abs(knee_y - hip_y)
-        body_height = abs(shoulder_y - hip_y)
-        shoulder_ankle = abs(shoulder_y - ankle_y)
-
-        # Suavizado
-        knee_hip = self.smooth(knee_hip, self.knee_hip_hist)
-        body_height = self.smooth(body_height, self.body_height_hist)
-        shoulder_ankle = self.smooth(shoulder_ankle, self.shoulder_ankle_hist)
-
-        
-        # CLASIFICACIÓN BASE (SIN TIEMPO)
-        if shoulder_ankle < 0.15:
-            detected_state = "Agachado"
-
-        elif body_height < 0.09:
-            detected_state = "Caido"
-
-        elif knee_hip < 0.075:
-            detected_state = "Sentado"
-
-        else:
-            detected_state = "De pie"
-
-        
-        # RETARDO DE CAMBIO DE ESTADO (ANTI-SALTOS)
-        
-        now = time.time()
-
-        if detected_state != self.last_state:
-            if self.pending_state != detected_state:
-                self.pending_state = detected_state
-                self.pending_since = now
-
-            elif now - self.pending_since >= self.state_delay:
-                self.last_state = detected_state
-                self.pending_state = None
-                self.pending_since = None
-        else:
-            self.pending_state = None
-            self.pending_since = None
-
-        posture = self.last_state or detected_state
-
-        # CAÍDA EN DOS ETAPAS
-        event = None
-
-        if posture == "Caido":
-            if self.fall_start_time is None:
-                # Posible caída
-                self.fall_start_time = now
-                self.fall_state = "Posible"
-                event = "Posible caida"
-
-            elif self.fall_state == "Posible" and now - self.fall_start_time >= self.confirm_time:
-                # Confirmación
-                self.fall_state = "Confirmada"
-                event = "Caida confirmada"
-
-        else:
-            if self.fall_state == "Confirmada":
-                event = "Recuperación de caida"
-
-            self.fall_state = None
-            self.fall_start_time = None
+        posture, event, metrics = self.engine.update([self.slot], kpts, self.clock())
+        posture = POSTURES[posture[0]]
+        event = EVENTS[event[0]]
 
         # DEBUG
         if self.debug:
+            knee_hip, body_height, shoulder_ankle = metrics[0]
             print(
                 f"{posture:10s} | "
                 f"SA={shoulder_ankle:.4f} | "
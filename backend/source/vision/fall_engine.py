@@ -0,0 +1,224 @@
+import numpy as np
+
+# Posture codes
+DE_PIE, SENTADO, CAIDO, AGACHADO = 0, 1, 2, 3
+POSTURES = ("De pie", "Sentado", "Caido", "Agachado")
+
+# Event codes
+NO_EVENT, POSIBLE_CAIDA, CAIDA_CONFIRMADA, RECUPERACION = 0, 1, 2, 3
+EVENTS = (None, "Posible caida", "Caida confirmada", "Recuperación de caida")
+
+# Fall stage codes
+FALL_NONE, FALL_POSIBLE, FALL_CONFIRMADA = 0, 1, 2
+FALL_STAGES = (None, "Posible", "Confirmada")
+
+# COCO keypoint indices used by the classifier
+L_SHOULDER, R_SHOULDER = 5, 6
+L_HIP, R_HIP = 11, 12
+L_KNEE, R_KNEE = 13, 14
+L_ANKLE, R_ANKLE = 15, 16
+
+DEFAULT_PARAMS = {
+    "shoulder_ankle": 0.15,   # Por debajo: Agachado
+    "body_height": 0.09,      # Por debajo: Caido
+    "knee_hip": 0.075,        # Por debajo: Sentado
+    "state_delay": 1.0,       # Segundos para cambiar estado
+    "confirm_time": 5.0,      # Segundos en el suelo para confirmar caída
+    "window": 9,              # Frames de suavizado
+}
+
+
+def posture_metrics(keypoints):
+    """(N, 17, 2) normalised keypoints -> (N, 3) [knee_hip, body_height, shoulder_ankle]."""
+    y = keypoints[..., 1]
+    shoulder_y = (y[:, L_SHOULDER] + y[:, R_SHOULDER]) / 2
+    hip_y = (y[:, L_HIP] + y[:, R_HIP]) / 2
+    knee_y = np.maximum(y[:, L_KNEE], y[:, R_KNEE])
+    ankle_y = np.maximum(y[:, L_ANKLE], y[:, R_ANKLE])
+    return np.stack([
+        np.abs(knee_y - hip_y),
+        np.abs(shoulder_y - hip_y),
+        np.abs(shoulder_y - ankle_y),
+    ], axis=1)
+
+
+class FallEngine:
+    """
+    Array-backed version of the FallDetector logic for many people at once.
+
+    Every tracked person (or camera) owns a slot. All per-slot state - the
+    smoothing ring buffers with running sums, the anti-jitter state machine
+    and the two-stage fall timer - lives in flat NumPy arrays, and update()
+    advances any subset of slots with a handful of vector operations.
+    Thresholds are per slot too, so one engine can evaluate many parameter
+    sets side by side.
+    """
+
+    def __init__(self, capacity=16, max_window=32, **params):
+        self.params = dict(DEFAULT_PARAMS)
+        self.params.update(params)
+        self.max_window = max(max_window, int(self.params["window"]))
+
+        self.slots = {}   # {key: slot}
+        self.free = []
+        self.capacity = 0
+        self._grow(max(1, capacity))
+
+    def _grow(self, capacity):
+        old = self.capacity
+        extra = capacity - old
+
+        def grow(name, shape_tail, fill, dtype):
+            new = np.full((extra,) + shape_tail, fill, dtype)
+            current = getattr(self, name, None)
+            setattr(self, name, new if current is None else np.concatenate([current, new]))
+
+        # Smoothing ring buffers: (S, W, 3) values, running sums, write index, fill count
+        grow("hist", (self.max_window, 3), 0.0, np.float64)
+        grow("hist_sum", (3,), 0.0, np.float64)
+        grow("hist_idx", (), 0, np.int64)
+        grow("hist_count", (), 0, np.int64)
+
+        # Estado visual estable
+        grow("last_state", (), -1, np.int64)
+        grow("pending_state", (), -1, np.int64)
+        grow("pending_since", (), np.nan, np.float64)
+
+        # Caída (2 etapas)
+        grow("fall_state", (), FALL_NONE, np.int64)
+        grow("fall_start", (), np.nan, np.float64)
+
+        # Per-slot thresholds
+        for name in ("shoulder_ankle", "body_height", "knee_hip", "state_delay", "confirm_time"):
+            grow("p_" + name, (), float(self.params[name]), np.float64)
+        grow("p_window", (), int(self.params["window"]), np.int64)
+
+        self.free.extend(range(capacity - 1, old - 1, -1))
+        self.capacity = capacity
+
+    def allocate(self, key, **params):
+        """Reserve a slot for key (optionally with its own thresholds)."""
+        if key in self.slots:
+            return self.slots[key]
+        if not self.free:
+            self._grow(self.capacity * 2)
+        slot = self.free.pop()
+        self._reset_slot(slot)
+        for name, value in params.items():
+            if name == "window":
+                value = min(int(value), self.max_window)
+            getattr(self, "p_" + name)[slot] = value
+        self.slots[key] = slot
+        return slot
+
+    def release(self, key):
+        slot = self.slots.pop(key, None)
+        if slot is not None:
+            self.free.append(slot)
+
+    def _reset_slot(self, slot):
+        self.hist[slot] = 0.0
+        self.hist_sum[slot] = 0.0
+        self.hist_idx[slot] = 0
+        self.hist_count[slot] = 0
+        self.last_state[slot] = -1
+        self.pending_state[slot] = -1
+        self.pending_since[slot] = np.nan
+        self.fall_state[slot] = FALL_NONE
+        self.fall_start[slot] = np.nan
+        for name in ("shoulder_ankle", "body_height", "knee_hip", "state_delay", "confirm_time"):
+            getattr(self, "p_" + name)[slot] = float(self.params[name])
+        self.p_window[slot] = int(self.params["window"])
+
+    def smooth(self, slots, values):
+        """Push (N, 3) metrics into the slots' ring buffers; return the window means."""
+        idx = self.hist_idx[slots]
+        full = self.hist_count[slots] >= self.p_window[slots]
+        old = self.hist[slots, idx]
+        # Running sum: add the new value, drop the one it overwrites once the window is full
+        self.hist_sum[slots] += values - np.where(full[:, None], old, 0.0)
+        self.hist[slots, idx] = values
+        self.hist_idx[slots] = (idx + 1) % self.p_window[slots]
+        self.hist_count[slots] = np.minimum(self.hist_count[slots] + 1, self.p_window[slots])
+        return self.hist_sum[slots] / self.hist_count[slots][:, None]
+
+    def update(self, slots, keypoints, now):
+        """
+        Advance `slots` (N,) with their (N, 17, 2) keypoints observed at `now`
+        (scalar or (N,) timestamps). Returns (posture codes, event codes, smoothed metrics).
+        """
+        slots = np.asarray(slots, np.int64)
+        now = np.broadcast_to(np.asarray(now, np.float64), slots.shape)
+
+        metrics = self.smooth(slots, posture_metrics(np.asarray(keypoints, np.float64)))
+        knee_hip, body_height, shoulder_ankle = metrics[:, 0], metrics[:, 1], metrics[:, 2]
+
+        # CLASIFICACIÓN BASE (SIN TIEMPO)
+        detected = np.where(
+            shoulder_ankle < self.p_shoulder_ankle[slots], AGACHADO,
+            np.where(body_height < self.p_body_height[slots], CAIDO,
+                     np.where(knee_hip < self.p_knee_hip[slots], SENTADO, DE_PIE)))
+
+        # RETARDO DE CAMBIO DE ESTADO (ANTI-SALTOS)
+        last = self.last_state[slots]
+        pending = self.pending_state[slots]
+        since = self.pending_since[slots]
+
+        changed = detected != last
+        restart = changed & (pending != detected)
+        commit = changed & ~restart & (now - since >= self.p_state_delay[slots])
+        clear = ~changed | commit
+
+        last = np.where(commit, detected, last)
+        pending = np.where(restart, detected, np.where(clear, -1, pending))
+        since = np.where(restart, now, np.where(clear, np.nan, since))
+
+        self.last_state[slots] = last
+        self.pending_state[slots] = pending
+        self.pending_since[slots] = since
+
+        posture = np.where(last >= 0, last, detected)
+
+        # CAÍDA EN DOS ETAPAS
+        fall_state = self.fall_state[slots]
+        fall_start = self.fall_start[slots]
+        is_fall = posture == CAIDO
+
+        begin = is_fall & np.isnan(fall_start)
+        confirm = (is_fall & ~begin & (fall_state == FALL_POSIBLE) &
+                   (now - fall_start >= self.p_confirm_time[slots]))
+        recover = ~is_fall & (fall_state == FALL_CONFIRMADA)
+
+        events = np.full(slots.shape, NO_EVENT, np.int64)
+        events[begin] = POSIBLE_CAIDA
+        events[confirm] = CAIDA_CONFIRMADA
+        events[recover] = RECUPERACION
+
+        fall_state = np.where(begin, FALL_POSIBLE, np.where(confirm, FALL_CONFIRMADA, fall_state))
+        fall_state = np.where(is_fall, fall_state, FALL_NONE)
+        fall_start = np.where(begin, now, np.where(is_fall, fall_start, np.nan))
+
+        self.fall_state[slots] = fall_state
+        self.fall_start[slots] = fall_start
+
+        return posture, events, metrics
+
+    def update_keys(self, keys, keypoints, now):
+        """update() by key, allocating slots for unseen keys. Returns (posture codes, event codes)."""
+        slots = [self.allocate(key) for key in keys]
+        if not slots:
+            return np.zeros((0,), np.int64), np.zeros((0,), np.int64)
+        posture, events, _ = self.update(slots, keypoints, now)
+        return posture, events
+
+    def fall_pending(self):
+        """True if any allocated slot is in a fall stage."""
+        if not self.slots:
+            return False
+        return bool((self.fall_state[list(self.slots.values())] != FALL_NONE).any())
+
+    def fall_possible(self):
+        """True if any allocated slot is in the "Posible" stage (fall not yet confirmed or rejected)."""
+        if not self.slots:
+            return False
+        return bool((self.fall_state[list(self.slots.values())] == FALL_POSIBLE).any())
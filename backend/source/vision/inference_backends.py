@@ -0,0 +1,106 @@
+import os
+import shutil
+import threading
+
+# Supported CPU inference backends for the pose model.
+#   torch          - stock Ultralytics PyTorch path (.pt)
+#   onnx           - ONNX Runtime (requires onnx + onnxruntime)
+#   onnx_int8      - ONNX Runtime with dynamic INT8 weight quantisation
+#   openvino       - OpenVINO IR (requires openvino)
+#   openvino_int8  - OpenVINO IR with NNCF INT8 post-training quantisation
+BACKENDS = ("torch", "onnx", "onnx_int8", "openvino", "openvino_int8")
+
+_export_lock = threading.RLock()
+
+
+def artifact_path(weights, backend, imgsz=640):
+    """Where the exported artifact for this backend is cached (next to the weights)."""
+    if backend == "torch":
+        return weights
+
+    base, _ = os.path.splitext(weights)
+    if backend == "onnx":
+        return f"{base}_{imgsz}.onnx"
+    if backend == "onnx_int8":
+        return f"{base}_{imgsz}_int8.onnx"
+    if backend == "openvino":
+        # Ultralytics recognises OpenVINO models by the _openvino_model suffix
+        return f"{base}_{imgsz}_openvino_model"
+    if backend == "openvino_int8":
+        return f"{base}_{imgsz}_int8_openvino_model"
+    raise ValueError(f"Unknown inference backend '{backend}'. Expected one of {BACKENDS}")
+
+
+def _export_onnx(weights, target, imgsz):
+    from ultralytics import YOLO
+
+    # dynamic=True so the BatchScheduler can send several frames per call
+    exported = YOLO(weights).export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True)
+    if os.path.abspath(exported) != os.path.abspath(target):
+        os.replace(exported, target)
+
+
+def _quantize_onnx(source, target):
+    import onnx
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    quantize_dynamic(source, target, weight_type=QuantType.QUInt8)
+
+    # Keep the Ultralytics metadata (task, kpt_shape, names) so the quantised
+    # model is post-processed exactly like the float one
+    float_model = onnx.load(source, load_external_data=False)
+    int8_model = onnx.load(target)
+    existing = {p.key for p in int8_model.metadata_props}
+    for prop in float_model.metadata_props:
+        if prop.key not in existing:
+            int8_model.metadata_props.add(key=prop.key, value=prop.value)
+    onnx.save(int8_model, target)
+
+
+def _export_openvino(weights, target, imgsz, int8=False, int8_data=None):
+    from ultralytics import YOLO
+
+    kwargs = {"format": "openvino", "imgsz": imgsz, "dynamic": True}
+    if int8:
+        kwargs["int8"] = True
+        if int8_data:
+            # Calibration dataset yaml; Ultralytics falls back to coco8-pose otherwise
+            kwargs["data"] = int8_data
+
+    exported = YOLO(weights).export(**kwargs)
+    if os.path.abspath(exported) != os.path.abspath(target):
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        shutil.move(exported, target)
+
+
+def prepare_model(weights, backend="torch", imgsz=640, int8_data=None):
+    """
+    Export `weights` to `backend` once and return the cached artifact path.
+    Subsequent calls (and restarts) reuse the artifact found next to the weights.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}'. Expected one of {BACKENDS}")
+
+    target = artifact_path(weights, backend, imgsz)
+    if backend == "torch" or os.path.exists(target):
+        # .pt weights are used as-is (Ultralytics downloads them if missing)
+        return target
+
+    with _export_lock:
+        if os.path.exists(target):
+            return target
+
+        print(f"[Backends] Exporting {weights} to {backend} (imgsz={imgsz})...")
+        if backend == "onnx":
+            _export_onnx(weights, target, imgsz)
+        elif backend == "onnx_int8":
+            float_path = prepare_model(weights, "onnx", imgsz)
+            _quantize_onnx(float_path, target)
+        elif backend == "openvino":
+            _export_openvino(weights, target, imgsz)
+        elif backend == "openvino_int8":
+            _export_openvino(weights, target, imgsz, int8=True, int8_data=int8_data)
+        print(f"[Backends] Cached {backend} model at {target}")
+
+    return target
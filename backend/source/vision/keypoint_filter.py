@@ -0,0 +1,138 @@
+import numpy as np
+
+try:
+    from .detections import Detections, NUM_KEYPOINTS
+except ImportError:
+    from detections import Detections, NUM_KEYPOINTS
+
+
+def _alpha(dt, cutoff):
+    """One-Euro smoothing factor for a low-pass at `cutoff` Hz sampled every dt seconds."""
+    return 1.0 / (1.0 + 1.0 / (2 * np.pi * cutoff * dt))
+
+
+class KeypointSmoother:
+    """
+    Per-track One-Euro filter over keypoint arrays (Casiez et al., 2012).
+
+    Slow movement is smoothed hard (jitter removal) and fast movement barely
+    at all (no lag on a fall): the cutoff frequency grows with each keypoint's
+    filtered speed. The filtered velocity also lets predict() extrapolate the
+    skeleton to any display time between inferences, capped at max_predict
+    seconds. State is kept in flat arrays keyed by track id, like PoseTracker.
+
+    Coordinates are normalised (0..1), so speeds are in frame sizes per second.
+    Keypoints at (0, 0) are treated as not visible: they stay at (0, 0) and the
+    filter restarts from the next measurement of that point.
+    """
+
+    def __init__(self, min_cutoff=1.0, beta=5.0, d_cutoff=1.0, max_predict=0.25, still_speed=0.005):
+        self.min_cutoff = min_cutoff    # Hz, smoothing of a still keypoint
+        self.beta = beta                # Cutoff increase per unit of speed
+        self.d_cutoff = d_cutoff        # Hz, smoothing of the velocity estimate
+        self.max_predict = max_predict  # Seconds a skeleton may be extrapolated
+        self.still_speed = still_speed  # Below this speed (frame sizes/s) nothing is extrapolated
+
+        self.ids = np.zeros((0,), np.int64)
+        self.keypoints = np.zeros((0, NUM_KEYPOINTS, 2), np.float32)
+        self.velocity = np.zeros((0, NUM_KEYPOINTS, 2), np.float32)
+        self.valid = np.zeros((0, NUM_KEYPOINTS), bool)
+        self.last_time = np.zeros((0,), np.float64)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _slots(self, track_ids, now):
+        """Row of each track id in the state arrays, creating rows for new tracks."""
+        track_ids = np.asarray(track_ids, np.int64)
+        new = track_ids[~np.isin(track_ids, self.ids)]
+        if len(new):
+            n = len(new)
+            self.ids = np.concatenate([self.ids, new])
+            self.keypoints = np.concatenate([self.keypoints, np.zeros((n, NUM_KEYPOINTS, 2), np.float32)])
+            self.velocity = np.concatenate([self.velocity, np.zeros((n, NUM_KEYPOINTS, 2), np.float32)])
+            self.valid = np.concatenate([self.valid, np.zeros((n, NUM_KEYPOINTS), bool)])
+            self.last_time = np.concatenate([self.last_time, np.full(n, now)])
+        order = np.argsort(self.ids)
+        return order[np.searchsorted(self.ids, track_ids, sorter=order)]
+
+    def update(self, track_ids, keypoints, now):
+        """Filter one measurement per track; returns the smoothed (N, 17, 2) keypoints."""
+        if len(track_ids) == 0:
+            return keypoints
+        slots = self._slots(track_ids, now)
+        measured = (keypoints != 0).any(-1)                                   # (N, 17)
+        fresh = measured & ~self.valid[slots]                                 # First sighting: take as is
+
+        dt = np.maximum(now - self.last_time[slots], 1e-3)[:, None, None]    # (N, 1, 1)
+        prev = self.keypoints[slots]
+        velocity = self.velocity[slots]
+        velocity = velocity + _alpha(dt, self.d_cutoff) * ((keypoints - prev) / dt - velocity)
+        cutoff = self.min_cutoff + self.beta * np.linalg.norm(velocity, axis=-1, keepdims=True)
+        smoothed = prev + _alpha(dt, cutoff) * (keypoints - prev)
+
+        smoothed = np.where(fresh[..., None], keypoints, smoothed)
+        velocity = np.where(fresh[..., None], 0, velocity)
+        smoothed = np.where(measured[..., None], smoothed, 0).astype(np.float32)
+        velocity = np.where(measured[..., None], velocity, 0).astype(np.float32)
+
+        self.keypoints[slots] = smoothed
+        self.velocity[slots] = velocity
+        self.valid[slots] = measured
+        self.last_time[slots] = now
+        return smoothed
+
+    def _find(self, track_ids):
+        """Row of each track id in the state arrays, -1 where the filter has no state (never creates rows)."""
+        track_ids = np.asarray(track_ids, np.int64)
+        slots = np.full(len(track_ids), -1, np.int64)
+        if len(self.ids) and len(track_ids):
+            order = np.argsort(self.ids)
+            candidates = order[np.minimum(np.searchsorted(self.ids, track_ids, sorter=order), len(order) - 1)]
+            found = self.ids[candidates] == track_ids
+            slots[found] = candidates[found]
+        return slots
+
+    def predict(self, track_ids, keypoints, now):
+        """
+        keypoints (aligned with track_ids) extrapolated to `now` at constant
+        velocity, or None when every keypoint is still enough that they stand.
+        Read-only: tracks the filter has no state for keep their keypoints.
+        """
+        slots = self._find(track_ids)
+        known = slots >= 0
+        if not known.any():
+            return None
+        slots = slots[known]
+        velocity = self.velocity[slots]
+        if not (np.abs(velocity) > self.still_speed).any():
+            return None
+        dt = np.clip(now - self.last_time[slots], 0, self.max_predict)[:, None, None]
+        moved = np.clip(self.keypoints[slots] + velocity * dt, 0, 1)
+        predicted = np.array(keypoints, np.float32)
+        predicted[known] = np.where(self.valid[slots][..., None], moved, 0)
+        return predicted
+
+    def predict_detections(self, detections, track_ids, now):
+        """
+        detections (aligned with track_ids) moved to `now` for display: keypoints
+        extrapolated and each box shifted by its person's mean keypoint motion.
+        Returns detections itself when nothing moves, so cached overlays stay valid.
+        """
+        if len(detections) == 0 or len(track_ids) != len(detections):
+            return detections
+        predicted = self.predict(track_ids, detections.keypoints, now)
+        if predicted is None:
+            return detections
+        visible = (predicted != 0).any(-1, keepdims=True)
+        shift = ((predicted - detections.keypoints) * visible).sum(1) / np.maximum(visible.sum(1), 1)
+        boxes = (detections.boxes + np.tile(shift, 2)).astype(np.float32)
+        return Detections(predicted, detections.keypoint_conf, boxes, detections.scores)
+
+    def release(self, track_ids):
+        keep = ~np.isin(self.ids, np.asarray(track_ids, np.int64))
+        self.ids = self.ids[keep]
+        self.keypoints = self.keypoints[keep]
+        self.velocity = self.velocity[keep]
+        self.valid = self.valid[keep]
+        self.last_time = self.last_time[keep]
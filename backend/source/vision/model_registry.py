@@ -0,0 +1,196 @@
+import threading
+import time
+
+try:
+    from .inference_backends import prepare_model
+except ImportError:
+    from inference_backends import prepare_model
+
+DEFAULT_POSE_MODEL = 'backend/models/yolov8n-pose.pt'
+DEFAULT_CONFIRM_MODEL = 'backend/models/yolov8s-pose.pt'  # Cascade second stage, see PoseService
+
+
+class SharedModel:
+    """
+    One loaded YOLO model shared by every PoseService that asks for the same
+    (weights, device, imgsz, backend). Ultralytics predictors keep per-call
+    state, so calls are serialised with a lock.
+    Non-torch backends go through Ultralytics' AutoBackend, so Results (and
+    the keypoints fed to FallDetector) have the same format on every backend.
+    """
+
+    def __init__(self, weights, device="cpu", imgsz=640, backend="torch", int8_data=None):
+        from ultralytics import YOLO
+
+        self.weights = weights
+        self.device = device
+        self.imgsz = imgsz
+        self.backend = backend
+        self.lock = threading.Lock()
+
+        start = time.time()
+        self.path = prepare_model(weights, backend, imgsz=imgsz, int8_data=int8_data)
+        self.model = YOLO(self.path, task="pose")
+        self.load_time = time.time() - start
+        self.calls = 0
+        self.last_used = time.time()
+
+    def __call__(self, source, **kwargs):
+        kwargs.setdefault("device", self.device)
+        kwargs.setdefault("imgsz", self.imgsz)
+        with self.lock:
+            self.calls += 1
+            self.last_used = time.time()
+            return self.model(source, **kwargs)
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of loaded models keyed by (weights, device, imgsz, backend).
+    Models requested with an idle_timeout are unloaded by a reaper thread once
+    they have not been called for that long; the next get() loads them again.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.models = {}      # {key: SharedModel}
+        self.key_locks = {}   # {key: Lock} so a slow load does not block other keys
+        self.idle_timeouts = {}  # {key: seconds} for models unloaded when unused
+        self.reaper = None
+
+    @staticmethod
+    def make_key(weights, device, imgsz, backend):
+        return (weights, str(device), int(imgsz), backend)
+
+    def get(self, weights=DEFAULT_POSE_MODEL, device="cpu", imgsz=640, backend="torch", int8_data=None,
+            idle_timeout=None):
+        key = self.make_key(weights, device, imgsz, backend)
+
+        with self.lock:
+            if idle_timeout is not None:
+                self.idle_timeouts[key] = idle_timeout
+                self._start_reaper()
+            model = self.models.get(key)
+            if model is not None:
+                return model
+            key_lock = self.key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            # Another thread may have finished loading while we waited
+            with self.lock:
+                model = self.models.get(key)
+            if model is not None:
+                return model
+
+            print(f"[ModelRegistry] Loading {weights} (device={device}, imgsz={imgsz}, backend={backend})...")
+            model = SharedModel(weights, device=device, imgsz=imgsz, backend=backend, int8_data=int8_data)
+            print(f"[ModelRegistry] Loaded {model.path} in {model.load_time:.2f}s")
+
+            with self.lock:
+                self.models[key] = model
+            return model
+
+    def is_loaded(self, weights, device="cpu", imgsz=640, backend="torch"):
+        with self.lock:
+            return self.make_key(weights, device, imgsz, backend) in self.models
+
+    def unload_idle(self, now=None):
+        """Drop models with an idle_timeout that have not been called for that long."""
+        now = time.time() if now is None else now
+        with self.lock:
+            idle = [key for key, timeout in self.idle_timeouts.items()
+                    if key in self.models and now - self.models[key].last_used > timeout]
+            for key in idle:
+                model = self.models.pop(key)
+                print(f"[ModelRegistry] Unloading {model.weights} after {now - model.last_used:.0f}s unused")
+        return idle
+
+    def _start_reaper(self):
+        # Called with self.lock held
+        if self.reaper is None:
+            self.reaper = threading.Thread(target=self._reap, daemon=True, name="ModelReaper")
+            self.reaper.start()
+
+    def _reap(self):
+        while True:
+            with self.lock:
+                interval = min(self.idle_timeouts.values(), default=60.0)
+            time.sleep(min(max(interval / 4, 1.0), 30.0))
+            self.unload_idle()
+
+    def stats(self):
+        with self.lock:
+            return [
+                {
+                    "weights": m.weights,
+                    "device": m.device,
+                    "imgsz": m.imgsz,
+                    "backend": m.backend,
+                    "calls": m.calls,
+                    "load_time": round(m.load_time, 3),
+                    "idle": round(time.time() - m.last_used, 1),
+                }
+                for m in self.models.values()
+            ]
+
+
+class LazyModel:
+    """
+    Handle to a model that only stays loaded while it is used.
+
+    prepare() loads it in a background thread, so callers keep using another
+    model until `ready`. The handle keeps the SharedModel it loaded, so a call
+    never reloads synchronously even if the registry's reaper unloads the
+    model after idle_timeout seconds without calls; the handle lets go of it
+    at the next `ready` check and the next prepare() loads it again.
+    A failed load (e.g. missing weights) is reported once, the handle then
+    stays unavailable and calling it raises RuntimeError.
+    """
+
+    def __init__(self, registry, weights, device="cpu", imgsz=640, backend="torch", idle_timeout=120.0):
+        self.registry = registry
+        self.weights = weights
+        self.device = device
+        self.imgsz = imgsz
+        self.backend = backend
+        self.idle_timeout = idle_timeout
+        self.failed = False
+        self.loader = None
+        self.model = None  # SharedModel once loaded
+
+    @property
+    def ready(self):
+        if self.model is not None and not self.registry.is_loaded(self.weights, self.device, self.imgsz, self.backend):
+            self.model = None  # Unloaded by the reaper
+        return self.model is not None
+
+    def prepare(self):
+        if self.failed or self.ready or (self.loader is not None and self.loader.is_alive()):
+            return
+        self.loader = threading.Thread(target=self._load, daemon=True, name=f"Load_{self.weights}")
+        self.loader.start()
+
+    def _load(self):
+        try:
+            self.model = self.registry.get(self.weights, device=self.device, imgsz=self.imgsz, backend=self.backend,
+                                           idle_timeout=self.idle_timeout)
+        except Exception as e:
+            print(f"[ModelRegistry] {self.weights} unavailable: {e}")
+            self.failed = True
+
+    def __call__(self, source, **kwargs):
+        model = self.model
+        if model is None:
+            raise RuntimeError(f"{self.weights} is not loaded" + (" (load failed)" if self.failed else ""))
+        return model(source, **kwargs)
+
+
+registry = ModelRegistry()
+
+
+def get_model(weights=DEFAULT_POSE_MODEL, device="cpu", imgsz=640, backend="torch", int8_data=None):
+    return registry.get(weights, device=device, imgsz=imgsz, backend=backend, int8_data=int8_data)
+
+
+def get_lazy_model(weights=DEFAULT_CONFIRM_MODEL, device="cpu", imgsz=640, backend="torch", idle_timeout=120.0):
+    return LazyModel(registry, weights, device=device, imgsz=imgsz, backend=backend, idle_timeout=idle_timeout)
@@ -0,0 +1,46 @@
+import cv2
+
+
+class MotionGate:
+    """
+    Cheap motion check run in front of pose inference.
+    Works on a small blurred grayscale copy of the frame and compares it
+    against a running-average background, so the cost is a few hundred
+    microseconds even for 1080p input.
+    """
+
+    def __init__(self, width=160, threshold=25, min_area=0.002, learning_rate=0.05):
+        self.width = width
+        self.threshold = threshold          # Per-pixel intensity change (0-255)
+        self.min_area = min_area            # Fraction of changed pixels that counts as motion
+        self.learning_rate = learning_rate  # Background adaptation speed
+        self.background = None
+        self.last_score = 0.0
+
+    def _prepare(self, frame):
+        h, w = frame.shape[:2]
+        height = max(1, int(h * self.width / w))
+        # INTER_LINEAR is ~40x cheaper than INTER_AREA here; the blur below absorbs the aliasing
+        small = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_LINEAR)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def update(self, frame):
+        """Feed a frame; returns True if the scene changed since the background."""
+        gray = self._prepare(frame)
+
+        if self.background is None or self.background.shape != gray.shape:
+            self.background = gray.astype("float32")
+            self.last_score = 1.0
+            return True  # First frame: let inference take a look
+
+        diff = cv2.absdiff(gray, cv2.convertScaleAbs(self.background))
+        _, mask = cv2.threshold(diff, self.threshold, 255, cv2.THRESH_BINARY)
+        self.last_score = cv2.countNonZero(mask) / float(mask.size)
+
+        cv2.accumulateWeighted(gray, self.background, self.learning_rate)
+        return self.last_score >= self.min_area
+
+    def reset(self):
+        self.background = None
+        self.last_score = 0.0
@@ -0,0 +1,173 @@
+import cv2
+import numpy as np
+
+# Colors (BGR) matching Tailwind
+POSTURE_COLORS = {
+    "De pie": (129, 185, 16),    # Emerald-500
+    "Sentado": (235, 96, 59),    # Blue-500
+    "Caido": (87, 67, 244),      # Rose-500
+    "Agachado": (235, 96, 59),   # Blue-500
+    "Desconocido": (148, 163, 184) # Slate-400
+}
+DEFAULT_COLOR = POSTURE_COLORS["Desconocido"]
+
+# COCO skeleton (keypoint index pairs) and colours, same layout as Ultralytics' plot()
+POSE_PALETTE = [(255, 128, 0), (255, 153, 51), (255, 178, 102), (230, 230, 0), (255, 153, 255),
+                (153, 204, 255), (255, 102, 255), (255, 51, 255), (102, 178, 255), (51, 153, 255),
+                (255, 153, 153), (255, 102, 102), (255, 51, 51), (153, 255, 153), (102, 255, 102),
+                (51, 255, 51), (0, 255, 0), (0, 0, 255), (255, 0, 0), (255, 255, 255)]
+SKELETON = [(15, 13), (13, 11), (16, 14), (14, 12), (11, 12), (5, 11), (6, 12), (5, 6), (5, 7),
+            (6, 8), (7, 9), (8, 10), (1, 2), (0, 1), (0, 2), (1, 3), (2, 4), (3, 5), (4, 6)]
+LIMB_COLORS = [POSE_PALETTE[i] for i in (9, 9, 9, 9, 7, 7, 7, 0, 0, 0, 0, 0, 16, 16, 16, 16, 16, 16, 16)]
+KPT_COLORS = [POSE_PALETTE[i] for i in (16, 16, 16, 16, 16, 0, 0, 0, 0, 0, 0, 9, 9, 9, 9, 9, 9)]
+KPT_CONF = 0.5
+KPT_RADIUS = 4
+
+# Posture badge (top-left of the frame) and per-track tag fonts
+BADGE_FONT, BADGE_SCALE, BADGE_PADDING, BADGE_ORIGIN = cv2.FONT_HERSHEY_DUPLEX, 1.0, 10, (30, 80)
+TAG_FONT, TAG_SCALE = cv2.FONT_HERSHEY_SIMPLEX, 0.5
+MAX_TAGS = 256
+
+_LIMB_A = np.array([a for a, _ in SKELETON])
+_LIMB_B = np.array([b for _, b in SKELETON])
+
+
+def _color_groups(colors):
+    """{color: index array} so every colour is drawn with a single call."""
+    groups = {}
+    for i, color in enumerate(colors):
+        groups.setdefault(color, []).append(i)
+    return [(color, np.array(idx)) for color, idx in groups.items()]
+
+
+_LIMB_GROUPS = _color_groups(LIMB_COLORS)
+_KPT_GROUPS = _color_groups(KPT_COLORS)
+
+
+def _text_sprite(text, color, font, scale, thickness=1):
+    """Text rendered once on black: (image, mask, x offset, y offset from the baseline origin)."""
+    (text_w, text_h), baseline = cv2.getTextSize(text, font, scale, thickness)
+    image = np.zeros((text_h + baseline + 2, text_w + 2, 3), np.uint8)
+    cv2.putText(image, text, (1, text_h + 1), font, scale, color, thickness, cv2.LINE_AA)
+    mask = image.any(axis=2).astype(np.uint8)
+    return image, mask, -1, -(text_h + 1)
+
+
+def _badge_sprite(text, bg_color):
+    """Opaque posture badge: coloured box with white text, as (image, None, x offset, y offset)."""
+    (text_w, text_h), _ = cv2.getTextSize(text, BADGE_FONT, BADGE_SCALE, 1)
+    pad = BADGE_PADDING
+    image = np.empty((text_h + 2 * pad + 1, text_w + 2 * pad + 1, 3), np.uint8)
+    image[:] = bg_color
+    cv2.putText(image, text, (pad, text_h + pad), BADGE_FONT, BADGE_SCALE, (255, 255, 255), 1, cv2.LINE_AA)
+    return image, None, -pad, -(text_h + pad)
+
+
+def _blit(frame, sprite, x, y):
+    """Copy a sprite onto frame with its origin at (x, y), clipped to the frame."""
+    image, mask, dx, dy = sprite
+    h, w = frame.shape[:2]
+    x0, y0 = x + dx, y + dy
+    sx0, sy0 = max(0, -x0), max(0, -y0)
+    x1, y1 = min(w, x0 + image.shape[1]), min(h, y0 + image.shape[0])
+    if x1 <= x0 + sx0 or y1 <= y0 + sy0:
+        return
+    roi = frame[y0 + sy0:y1, x0 + sx0:x1]
+    src = image[sy0:sy0 + roi.shape[0], sx0:sx0 + roi.shape[1]]
+    if mask is None:
+        roi[:] = src
+    else:
+        cv2.copyTo(src, mask[sy0:sy0 + roi.shape[0], sx0:sx0 + roi.shape[1]], roi)
+
+
+class OverlayRenderer:
+    """
+    Draws skeletons, boxes, track tags and the posture badge onto outgoing frames.
+
+    Pixel geometry is computed once per inference result and frame size and
+    skeletons are drawn with one cv2.polylines call per colour; limbs are two-point lines and
+    keypoints zero-length lines whose round caps make the dots. Labels are
+    sprites rendered once per text and copied into place, so redrawing a
+    cached result costs a few hundred microseconds at preview size, most of
+    it anti-aliased rasterisation; antialias=False roughly halves that.
+    Keypoint dots are always drawn aliased, they are too small for it to show.
+    """
+
+    def __init__(self, colors=POSTURE_COLORS, antialias=True):
+        self.colors = colors
+        self.line_type = cv2.LINE_AA if antialias else cv2.LINE_8
+        self.badges = {posture: _badge_sprite(posture, color) for posture, color in colors.items()}
+        self.tags = {}  # {(track_id, posture): sprite}
+
+        self._key = None
+        self._detections = None
+        self._boxes = []  # [(top-left, bottom-right, color)]
+        self._lines = []  # [(segments, color, thickness, line type)]
+        self._labels = []  # [(sprite, x, y)]
+
+    def draw(self, frame, detections, track_ids, track_postures, posture):
+        h, w = frame.shape[:2]
+        postures = tuple(track_postures.get(t, "Desconocido") for t in track_ids)
+        key = (w, h, tuple(track_ids), postures)
+        if detections is not self._detections or key != self._key:
+            self._build(detections, track_ids, postures, w, h)
+            self._detections, self._key = detections, key
+
+        for pt1, pt2, color in self._boxes:
+            cv2.rectangle(frame, pt1, pt2, color, 2)
+        for segments, color, thickness, line_type in self._lines:
+            cv2.polylines(frame, segments, False, color, thickness, line_type)
+        for sprite, x, y in self._labels:
+            _blit(frame, sprite, x, y)
+        _blit(frame, self._badge(posture), *BADGE_ORIGIN)
+        return frame
+
+    def _badge(self, posture):
+        if posture not in self.badges:
+            self.badges[posture] = _badge_sprite(posture, self.colors.get(posture, DEFAULT_COLOR))
+        return self.badges[posture]
+
+    def _tag(self, track_id, posture):
+        key = (track_id, posture)
+        sprite = self.tags.get(key)
+        if sprite is None:
+            if len(self.tags) >= MAX_TAGS:
+                self.tags.clear()
+            sprite = _text_sprite(f"#{track_id} {posture}", self.colors.get(posture, DEFAULT_COLOR), TAG_FONT, TAG_SCALE)
+            self.tags[key] = sprite
+        return sprite
+
+    def _build(self, detections, track_ids, postures, w, h):
+        """Pixel-space polylines and label positions for one inference result."""
+        self._boxes, self._lines, self._labels = [], [], []
+        n = len(detections)
+        if n == 0:
+            return
+        scale = np.array([w, h], np.float32)
+        points = (detections.keypoints * scale).astype(np.int32)  # (N, 17, 2)
+        visible = (detections.keypoint_conf >= KPT_CONF) & (detections.keypoints > 0).all(axis=-1)
+        boxes = (detections.boxes * np.tile(scale, 2)).astype(np.int32)
+        tracked = len(track_ids) == n
+        person_postures = postures if tracked else ("Desconocido",) * n
+
+        # Boxes in the colour of each person's posture (axis-aligned: cv2.rectangle beats polylines)
+        for (x0, y0, x1, y1), p in zip(boxes.tolist(), person_postures):
+            self._boxes.append(((x0, y0), (x1, y1), self.colors.get(p, DEFAULT_COLOR)))
+
+        # Limbs: (N, 19, 2, 2) segments, kept where both ends are visible
+        segments = np.stack([points[:, _LIMB_A], points[:, _LIMB_B]], axis=2)
+        shown = visible[:, _LIMB_A] & visible[:, _LIMB_B]
+        for color, idx in _LIMB_GROUPS:
+            limbs = segments[:, idx][shown[:, idx]]
+            if len(limbs):
+                self._lines.append((list(limbs), color, 2, self.line_type))
+
+        # Keypoints: zero-length segments drawn with round caps
+        for color, idx in _KPT_GROUPS:
+            dots = points[:, idx][visible[:, idx]]
+            if len(dots):
+                self._lines.append((list(np.repeat(dots[:, None], 2, axis=1)), color, 2 * KPT_RADIUS, cv2.LINE_8))
+
+        if tracked:
+            for (x, y, _, _), track_id, posture in zip(boxes.tolist(), track_ids, postures):
+                self._labels.append((self._tag(track_id, posture), x, max(15, y - 6)))
@@ -1,175 +1,369 @@
-from ultralytics import YOLO
 import cv2
 import numpy as np
+import threading
 import time
 
 # Use relative imports assuming this is run as part of the backend package
 try:
-    from .fall_detector import FallDetector
+    from .fall_engine import FallEngine, POSTURES, EVENTS
     from .chatbot import on_event
+    from .model_registry import get_model, get_lazy_model, DEFAULT_POSE_MODEL
+    from .batch_scheduler import BatchScheduler
+    from .motion_gate import MotionGate
+    from .detection_zones import DetectionZones
+    from .detections import Detections
+    from .tracker import PoseTracker
+    from .keypoint_filter import KeypointSmoother
+    from .overlay import OverlayRenderer
 except ImportError:
     # Fallback for direct execution
-    from fall_detector import FallDetector
+    from fall_engine import FallEngine, POSTURES, EVENTS
     from chatbot import on_event
+    from model_registry import get_model, get_lazy_model, DEFAULT_POSE_MODEL
+    from batch_scheduler import BatchScheduler
+    from motion_gate import MotionGate
+    from detection_zones import DetectionZones
+    from detections import Detections
+    from tracker import PoseTracker
+    from keypoint_filter import KeypointSmoother
+    from overlay import OverlayRenderer
+
+# Which posture the camera badge shows when several people are tracked
+POSTURE_PRIORITY = {"Caido": 4, "Agachado": 3, "Sentado": 2, "De pie": 1}
 
 class PoseService:
-    def __init__(self, camera_id="1", alert_manager=None):
+    def __init__(self, camera_id="1", alert_manager=None, model_path=DEFAULT_POSE_MODEL, device="cpu", imgsz=640, backend="torch", scheduler=None, settings=None,
+                 clock=time.time, event_callback=None, trace_writer=None, evidence_stream=None, pose_feed=None):
         self.camera_id = camera_id
+        self.clock = clock  # Injectable so offline replay can run on frame timestamps
+        self.event_callback = event_callback  # callable(track_id, event, posture, timestamp)
+        self.trace_writer = trace_writer  # Optional TraceWriter recording every analysed frame
+        self.settings = settings or {}  # Per-camera vision knobs ("vision" settings + camera overrides)
         self.alert_manager = alert_manager
+        self.scheduler = scheduler  # Optional BatchScheduler shared across cameras
+        self.evidence_stream = evidence_stream  # Optional main-stream RTSPStream, opened only for alerts
+        self.pose_feed = pose_feed  # Optional PoseFeed: keypoint metadata for client-side overlays
         self.disabled = False
-        self.detector = FallDetector()
         self.model = None
+
+        # Multi-person: stable track ids, one FallEngine slot per tracked person
+        self.tracker = PoseTracker(max_age=self.settings.get("track_max_age", 2.0))
+        self.fall_engine = FallEngine(**self.settings.get("fall_params", {}))  # Tuned thresholds, see scripts/tune_thresholds.py
+        self.track_postures = {}   # {track_id: posture}
+        self.lost_tracks = []      # Tracks dropped since the last alert update (only with an alert manager)
+        # One-Euro keypoint filter: clean FallEngine input and smooth skeletons between inferences
+        smoothing = self.settings.get("keypoint_smoothing", True)
+        self.smoother = None
+        if smoothing:
+            self.smoother = KeypointSmoother(**(smoothing if isinstance(smoothing, dict) else {}))
         
         # Caching for performance
         self.last_inference_time = 0
-        self.inference_interval = 0.1 # Run AI every 100ms (10 FPS)
-        self.last_results = None
+        self.last_result_time = 0
+        self.results_lock = threading.Lock()  # Results come from the batch scheduler and the cascade
+        self.inference_interval = self.settings.get("inference_interval", 0.1) # Run AI every 100ms (10 FPS)
+        # (detections, track ids) of the last inference, replaced as one tuple under results_lock
+        self.last_result = (Detections.empty(), [])
         self.last_posture = "Desconocido"
+        self.person_present = False
+
+        # Dual resolution: downscaled inference input and preview, full res only for alerts
+        self.inference_width = self.settings.get("inference_width", imgsz)
+        self.preview_width = self.settings.get("preview_width", 960)
+        self.evidence_idle = self.settings.get("evidence_idle", 30.0)  # Seconds before the main stream is closed
+        self.last_evidence_need = 0
+        self._inference_buf = None
+        self._preview_buf = None
+        # Cached skeleton geometry and label sprites for the outgoing frames
+        self.overlay = OverlayRenderer(antialias=self.settings.get("overlay_antialias", True))
+
+        # Detection zones: inference only sees the configured regions
+        self.zones = DetectionZones(self.settings.get("zones"))
+
+        # Motion gating: on a static, empty scene only run AI every idle_interval,
+        # with people present but a static scene every calm_interval (needs smoothing)
+        self.idle_interval = self.settings.get("idle_interval", 1.0)
+        self.calm_interval = self.settings.get("calm_interval", 0.2)
+        self.motion_gate = None
+        if self.settings.get("motion_gating", True):
+            self.motion_gate = MotionGate(
+                threshold=self.settings.get("motion_threshold", 25),
+                min_area=self.settings.get("motion_min_area", 0.002),
+            )
         
         try:
-            print(f"[PoseService] Initializing YOLOv8n-pose for Cam {camera_id}...")
-            # Load nano model for speed
-            self.model = YOLO('backend/models/yolov8n-pose.pt') 
-            print(f"[PoseService] YOLOv8n-pose initialized for Cam {camera_id}.")
+            # Nano model for speed, loaded once per process and shared by all cameras
+            self.model = get_model(model_path, device=device, imgsz=imgsz, backend=backend)
+            print(f"[PoseService] YOLOv8n-pose ready for Cam {camera_id}.")
         except Exception as e:
             print(f"[PoseService] WARNING: Vision system disabled. Error: {e}")
             self.disabled = True
 
-    def process_frame(self, frame):
+        # Cascade (off unless "confirm_model" names weights, e.g. DEFAULT_CONFIRM_MODEL): while a
+        # fall is "Posible", a larger model re-checks this camera on its own worker thread.
+        # Loaded on the first possible fall, unloaded after confirm_idle seconds unused
+        self.confirm_model = None
+        self.confirm_scheduler = None
+        self.confirm_runs = 0
+        confirm_weights = self.settings.get("confirm_model")
+        if confirm_weights and not self.disabled:
+            self.confirm_model = get_lazy_model(confirm_weights, device=device, imgsz=imgsz, backend=backend,
+                                                idle_timeout=self.settings.get("confirm_idle", 120.0))
+            self.confirm_scheduler = BatchScheduler(self.confirm_model, max_batch=1, window=0)
+
+    def process_frame(self, frame, seq=None, draw=True):
+        """
+        Run the pipeline on one canonical capture and return the preview frame.
+        Inference sees a downscaled copy, viewers get a preview_width frame and
+        only alerts (snapshots, recordings) get full resolution. seq is the
+        capture sequence number reported on the pose feed; with draw=False the
+        preview is returned without overlay (the caller draws it if needed).
+        """
         if self.disabled or frame is None or self.model is None:
             return frame
 
+        preview = frame
+        evidence = None
         try:
-            current_time = time.time()
-            
-            # --- INFERENCE THROTTLING ---
-            # Only run heavy model inference if enough time has passed
-            if current_time - self.last_inference_time > self.inference_interval:
-                # Run Inference
-                results = self.model(frame, verbose=False, conf=0.5)
-                self.last_results = results
-                self.last_inference_time = current_time
-                
-                # Analyze posture from valid results
-                for result in results:
-                    if result.keypoints is not None and result.keypoints.xyn.shape[1] >= 17:
-                        kpts = result.keypoints.xyn[0] 
-                        
-                        def get_p(idx):
-                            return (float(kpts[idx][0]), float(kpts[idx][1]))
-
-                        coords = {
-                            "left_shoulder": get_p(5), "right_shoulder": get_p(6),
-                            "left_hip": get_p(11), "right_hip": get_p(12),
-                            "left_knee": get_p(13), "right_knee": get_p(14),
-                            "left_ankle": get_p(15), "right_ankle": get_p(16)
-                        }
-
-                        posture, event = self.detector.classify_posture(coords)
-                        self.last_posture = posture
-                        
-                        if event:
-                            on_event(event, posture)
-                        
-
-                        break
+            self.analyze(self._downscale(frame, self.inference_width, "_inference_buf"), seq=seq)
 
             # --- DRAWING (Always draw using cached results) ---
-            
-            # Draw Skeleton (if we have results)
-            if self.last_results:
-                for result in self.last_results:
-                     # We use the built-in plotter on the CURRENT frame
-                     # Note: result.plot() creates a new image. We want to draw on 'frame'.
-                     # Actually, result.plot() returns the image. 
-                     # Optimally we should just draw manually if caching, 
-                     # but detection boxes might drift if camera moves fast.
-                     # For simplicity/robustness, we re-plot the *old* detection on the *new* frame? 
-                     # No, that looks floaty. 
-                     # Better approach: Just draw the overlay if inference ran?
-                     # No, user wants smooth 30fps video with 10fps AI.
-                     # If we don't draw anything in between, the skeleton flickers.
-                     # YOLO's result.plot() creates a new numpy array.
-                     
-                     # To avoid flicker, we can't easily use result.plot() on a *different* frame 
-                     # because 'result' contains specific image dimensions/data.
-                     # So we only update the 'frame' with the plot output WHEN we run inference.
-                     # But for the skipped frames, we just return the raw frame with TEXT overlay.
-                     # Skeleton overlay will effectively run at 10fps (jittery) on top of 30fps video?
-                     # Or we can just accept 30fps inference if YOLOv8n is fast enough (it usually is >50fps on CPU).
-                     # The user's issue was "slow RTSP". That was because I BLOCKED the Capture thread.
-                     # Moving it back to API thread decouples it naturally.
-                     # API thread can run as slow as it wants (15fps) while RTSP capture is 30fps.
-                     
-                     # Let's simple-draw:
-                     # If inference ran, we replace 'frame' with plotted version.
-                     # If skipped, we return raw frame.
-                     # Result: Stuttery skeleton, smooth video. This is acceptable.
-                     pass
-
-            # Update 'frame' if we just ran inference? 
-            # Actually, YOLO plot() returns a NEW image.
-            # If we are in skipping mode, we haven't updated 'frame'.
-            
-            if self.last_results:
-                 # Re-draw the cached result on the current frame?
-                 # result.plot(img=frame) allows drawing on custom image! (Ultralytics feature)
-                 for result in self.last_results:
-                     frame = result.plot(img=frame)
-                     break
-
-            # Draw Status Text (Always, using cached posture)
-            posture = self.last_posture
-            
-            # Colors (BGR) matching Tailwind
-            colors = {
-                "De pie": (129, 185, 16),    # Emerald-500
-                "Sentado": (235, 96, 59),    # Blue-500
-                "Caido": (87, 67, 244),      # Rose-500
-                "Agachado": (235, 96, 59),   # Blue-500
-                "Desconocido": (148, 163, 184) # Slate-400
-            }
-            
-            text_color = (255, 255, 255) # White text
-            bg_color = colors.get(posture, (148, 163, 184))
-            
-            # Text Config
-            font = cv2.FONT_HERSHEY_DUPLEX
-            font_scale = 1.0
-            thickness = 1
-            padding = 10
-            
-            (text_w, text_h), baseline = cv2.getTextSize(posture, font, font_scale, thickness)
-            x, y = 30, 80
-            
-            cv2.rectangle(frame, 
-                         (x - padding, y - text_h - padding), 
-                         (x + text_w + padding, y + padding), 
-                         bg_color, -1) 
-            
-            cv2.putText(frame, posture, (x, y),
-                        font, font_scale, text_color, thickness, cv2.LINE_AA)
+            preview = self._downscale(frame, self.preview_width, "_preview_buf")
+            if draw:
+                self.draw_overlay(preview)
 
+            evidence = self._evidence_frame(frame, preview, draw)
         except Exception as e:
             # print(f"[PoseService] Error processing frame: {e}")
             pass
-            
+
         if self.alert_manager:
-             # Check for alerts using the fully drawn frame
-             alert_status = "Caída detectada" if self.last_posture == "Caido" else "Normal"
-             self.alert_manager.process_event(
-                self.camera_id, 
-                f"Cámara {self.camera_id}", 
-                alert_status, 
-                0.90, 
-                frame
-             )
+             alert_frame = evidence if evidence is not None else preview
+             # Check for alerts using the fully drawn frame, one fall timer per person
+             for track_id, track_posture in list(self.track_postures.items()):
+                 alert_status = "Caída detectada" if track_posture == "Caido" else "Normal"
+                 self.alert_manager.process_event(
+                    self.camera_id, 
+                    f"Cámara {self.camera_id}", 
+                    alert_status, 
+                    0.90, 
+                    alert_frame,
+                    track_id=track_id
+                 )
+
+             # Dropped tracks: the alert manager decides when a fall of theirs is over
+             while self.lost_tracks:
+                 self.alert_manager.process_event(
+                    self.camera_id, f"Cámara {self.camera_id}", "Perdido", 0.90, alert_frame,
+                    track_id=self.lost_tracks.pop()
+                 )
+             # Lost falls time out even when nobody is tracked any more
+             self.alert_manager.expire(self.camera_id, f"Cámara {self.camera_id}")
              
              # Pass to AlertManager for potential recording
-             self.alert_manager.write_frame(self.camera_id, frame)
+             if evidence is not None:
+                 self.alert_manager.write_frame(self.camera_id, evidence)
+
+             # Pre-roll for the next recording (skipped while one is running)
+             self.alert_manager.buffer_frame(self.camera_id, preview, prepare=None if draw else self.draw_overlay)
             
-        return frame
+        return preview
+
+    def _downscale(self, frame, width, buf_name):
+        """frame resized to `width` px wide into a reused buffer (frame itself if already small enough)."""
+        h, w = frame.shape[:2]
+        if not width or w <= width:
+            return frame
+        size = (int(width), int(round(h * width / w)))
+        buf = getattr(self, buf_name)
+        if buf is None or buf.shape[1::-1] != size:
+            buf = np.empty((size[1], size[0], 3), np.uint8)
+            setattr(self, buf_name, buf)
+        return cv2.resize(frame, size, dst=buf, interpolation=cv2.INTER_AREA)
+
+    def frame_interval(self):
+        """Seconds between the frames analysis needs (FrameHub pacing while nobody is watching)."""
+        if self._needs_evidence():
+            return 0.0  # Developing fall or recording: every frame
+        return self.inference_interval
+
+    def _needs_evidence(self):
+        """Full resolution is only worth producing while a fall is developing or being recorded."""
+        if "Caido" in self.track_postures.values() or self.fall_engine.fall_pending():
+            return True
+        return self.alert_manager is not None and self.alert_manager.is_recording(self.camera_id)
+
+    def _evidence_frame(self, frame, preview, preview_drawn=True):
+        """Full-resolution frame with overlays for AlertManager, or None when no alert needs one."""
+        now = time.time()
+        if not self._needs_evidence():
+            if now - self.last_evidence_need > self.evidence_idle and \
+                    self.evidence_stream is not None and self.evidence_stream.running:
+                # Main stream no longer needed: drop the high-resolution decoder
+                self.evidence_stream.stop()
+            return None
+        self.last_evidence_need = now
+
+        evidence = frame
+        if self.evidence_stream is not None:
+            # Camera main stream, connected on the first "Posible caida" so it is ready by confirmation
+            if not self.evidence_stream.running:
+                self.evidence_stream.start()
+            success, main_frame = self.evidence_stream.read()
+            if success:
+                evidence = main_frame.copy()
+
+        if evidence is preview and not preview_drawn:
+            evidence = preview.copy()  # Preview goes out raw; evidence always carries the overlay
+        if evidence is not preview:
+            self.draw_overlay(evidence)
+        return evidence
+
+    def draw_overlay(self, frame):
+        """Zones, skeletons, track labels and the posture badge, drawn in place."""
+        if self.zones:
+            self.zones.draw(frame)
+        with self.results_lock:
+            # Consistent snapshot: results are applied on the scheduler thread
+            detections, track_ids = self.last_result
+            track_postures, posture = self.track_postures, self.last_posture
+            if self.smoother:
+                detections = self.smoother.predict_detections(detections, track_ids, self.clock())
+        self.overlay.draw(frame, detections, track_ids, track_postures, posture)
+
+    def analyze(self, frame, now=None, seq=None):
+        """Inference + posture analysis only (no drawing, no alerts)."""
+        if self.disabled or frame is None or self.model is None:
+            return
+        current_time = self.clock() if now is None else now
+
+        # --- INFERENCE THROTTLING ---
+        # Only run heavy model inference if enough time has passed
+        if self._should_infer(frame, current_time):
+            self.last_inference_time = current_time
+            self._run_inference(frame, current_time, seq)
+
+    def _should_infer(self, frame, now):
+        elapsed = now - self.last_inference_time
+        if elapsed <= self.inference_interval:
+            return False
+        if self.motion_gate is None:
+            return True
+
+        motion = self.motion_gate.update(frame)
+
+        # A pending or confirmed fall keeps the active rate so FallDetector's
+        # confirmation timer keeps ticking; a still person is followed at the
+        # calm rate, the keypoint filter carries the skeleton in between
+        if motion or self.fall_engine.fall_pending() or "Caido" in self.track_postures.values():
+            return True
+        if self.person_present:
+            return self.smoother is None or elapsed >= self.calm_interval
+        return elapsed >= self.idle_interval
+
+    def _run_inference(self, frame, now, seq=None):
+        if self.zones:
+            inputs, regions = self.zones.crop(frame)
+            if not inputs:
+                return
+        else:
+            inputs, regions = [frame], [None]
+
+        frame_shape = frame.shape
+        if self.confirm_model is not None and self.fall_engine.fall_possible():
+            self.confirm_model.prepare()
+            if self.confirm_model.ready:
+                # Until the fall is confirmed or rejected; the nano model covers the load time.
+                # Runs off the hub thread, a newer frame replaces one still waiting
+                if self.scheduler:
+                    self.scheduler.remove(self.camera_id)  # A queued nano frame would now be stale
+                if regions[0] is None:
+                    inputs = [frame.copy()]
+                self.confirm_runs += 1
+                self.confirm_scheduler.start().submit(
+                    self.camera_id, inputs, lambda results: self._on_results(results, regions, frame_shape, now, seq))
+                return
+
+        if self.scheduler:
+            # Batched with other cameras; results arrive via _on_results.
+            # A newer frame replaces one still waiting for the batch.
+            if regions[0] is None:
+                inputs = [frame.copy()]
+            self.scheduler.submit(self.camera_id, inputs,
+                                  lambda results: self._on_results(results, regions, frame_shape, now, seq))
+        else:
+            results = self.model(inputs, verbose=False, conf=0.5)
+            self._on_results(results, regions, frame_shape, now, seq)
+
+    def _on_results(self, results, regions=None, frame_shape=None, now=None, seq=None):
+        if now is None:
+            now = self.clock()
+        with self.results_lock:
+            # A batched nano result can land after a newer cascade result: drop it
+            if now < self.last_result_time:
+                return
+            self.last_result_time = now
+            self._apply_results(results, regions, frame_shape, now, seq)
+
+    def _apply_results(self, results, regions, frame_shape, now, seq):
+        results = list(results)
+        if regions is None:
+            regions = [None] * len(results)
+
+        # Keypoints in full-frame normalised coordinates, whatever the crop
+        detections = Detections.from_results(results, regions, frame_shape)
+        self.person_present = len(detections) > 0
+
+        # Analyze posture of every tracked person in one vectorised step
+        # (timed by the frame's capture time, not by when the batch came back)
+        track_ids, lost = self.tracker.update(detections, now)
+        track_ids = track_ids.tolist()
+        if self.smoother:
+            # Tracks match on raw keypoints; everything downstream (FallEngine,
+            # traces, overlay, pose feed) sees the filtered ones
+            keypoints = self.smoother.update(track_ids, detections.keypoints, now)
+            detections = Detections(keypoints, detections.keypoint_conf, detections.boxes, detections.scores)
+            self.smoother.release(lost)
+        posture_codes, event_codes = self.fall_engine.update_keys(track_ids, detections.keypoints, now)
+        posture_names = [POSTURES[p] for p in posture_codes]
+        postures = dict(zip(track_ids, posture_names))
+
+        if self.trace_writer:
+            self.trace_writer.append(now, track_ids, detections.keypoints, detections.keypoint_conf,
+                                     posture_codes, event_codes)
+
+        for track_id, posture, code in zip(track_ids, posture_names, event_codes):
+            event = EVENTS[code]
+            if event:
+                on_event(event, posture)
+                if self.event_callback:
+                    self.event_callback(track_id, event, posture, now)
+
+        # Evict state of lost tracks; tracks missed this round keep their last posture
+        for track_id in lost:
+            self.fall_engine.release(track_id)
+        if self.alert_manager:
+            self.lost_tracks.extend(lost)  # Drained by process_frame; nobody would offline
+        self.track_postures = {
+            t: postures.get(t, self.track_postures.get(t, "Desconocido")) for t in self.tracker.ids.tolist()
+        }
+        self.last_result = (detections, track_ids)
+
+        if self.track_postures:
+            self.last_posture = max(self.track_postures.values(), key=lambda p: POSTURE_PRIORITY.get(p, 0))
+
+        if self.pose_feed:
+            self.pose_feed.publish(seq, now, detections, track_ids, self.track_postures, self.last_posture)
 
     def close(self):
-        # Nothing specific to close for YOLO
-        pass
+        # Shared model stays loaded in the registry; just drop queued work
+        if self.scheduler:
+            self.scheduler.remove(self.camera_id)
+        if self.confirm_scheduler:
+            self.confirm_scheduler.stop()
+        if self.trace_writer:
+            self.trace_writer.close()
+        if self.evidence_stream:
+            self.evidence_stream.stop()
+        if self.alert_manager:
+            self.alert_manager.drop_preroll(self.camera_id)
@@ -0,0 +1,129 @@
+import numpy as np
+
+try:
+    from .detections import NUM_KEYPOINTS
+except ImportError:
+    from detections import NUM_KEYPOINTS
+
+
+def box_iou(a, b):
+    """IoU matrix between (N, 4) and (M, 4) xyxy boxes."""
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), np.float32)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def keypoint_similarity(a, b, boxes_a):
+    """
+    OKS-style similarity between (N, 17, 2) and (M, 17, 2) keypoints, scaled by
+    the size of the track boxes. Keypoints at (0, 0) (not visible) are ignored.
+    """
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), np.float32)
+    visible = (a[:, None] != 0).any(-1) & (b[None, :] != 0).any(-1)          # (N, M, 17)
+    dist2 = ((a[:, None] - b[None, :]) ** 2).sum(-1)                          # (N, M, 17)
+    area = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    scale2 = np.maximum(area, 1e-4)[:, None, None] * 0.1
+    sim = np.exp(-dist2 / (2 * scale2)) * visible
+    return sim.sum(-1) / np.maximum(visible.sum(-1), 1)
+
+
+class PoseTracker:
+    """
+    Lightweight IoU + keypoint tracker giving stable ids to the people in one
+    camera. Track state lives in flat NumPy arrays; matching is greedy on a
+    vectorised score matrix, so cost stays close to linear for the handful of
+    people a room camera sees (a dozen is still well under a millisecond).
+    """
+
+    def __init__(self, match_threshold=0.3, max_age=2.0, keypoint_weight=0.5):
+        self.match_threshold = match_threshold
+        self.max_age = max_age              # Seconds without a match before a track is dropped
+        self.keypoint_weight = keypoint_weight
+        self.next_id = 1
+
+        self.ids = np.zeros((0,), np.int64)
+        self.boxes = np.zeros((0, 4), np.float32)
+        self.keypoints = np.zeros((0, NUM_KEYPOINTS, 2), np.float32)
+        self.last_seen = np.zeros((0,), np.float64)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _match(self, detections):
+        """Greedy assignment: returns (track_idx, det_idx) pairs."""
+        iou = box_iou(self.boxes, detections.boxes)
+        oks = keypoint_similarity(self.keypoints, detections.keypoints, self.boxes)
+        score = (1 - self.keypoint_weight) * iou + self.keypoint_weight * oks
+
+        pairs = []
+        if score.size == 0:
+            return pairs
+
+        used_tracks = np.zeros(score.shape[0], bool)
+        used_dets = np.zeros(score.shape[1], bool)
+        order = np.argsort(score, axis=None)[::-1]
+        for flat in order:
+            t, d = divmod(int(flat), score.shape[1])
+            if score[t, d] < self.match_threshold:
+                break
+            if used_tracks[t] or used_dets[d]:
+                continue
+            used_tracks[t] = used_dets[d] = True
+            pairs.append((t, d))
+            if len(pairs) == min(score.shape):
+                break
+        return pairs
+
+    def update(self, detections, now):
+        """
+        Assign a track id to every detection.
+        Returns (track_ids aligned with detections, [ids of tracks that were lost]).
+        """
+        n = len(detections)
+        det_ids = np.zeros((n,), np.int64)
+
+        for t, d in self._match(detections):
+            det_ids[d] = self.ids[t]
+            self.boxes[t] = detections.boxes[d]
+            self.keypoints[t] = detections.keypoints[d]
+            self.last_seen[t] = now
+
+        # New tracks for unmatched detections
+        new = np.flatnonzero(det_ids == 0)
+        if len(new):
+            new_ids = np.arange(self.next_id, self.next_id + len(new), dtype=np.int64)
+            self.next_id += len(new)
+            det_ids[new] = new_ids
+            self.ids = np.concatenate([self.ids, new_ids])
+            self.boxes = np.concatenate([self.boxes, detections.boxes[new]])
+            self.keypoints = np.concatenate([self.keypoints, detections.keypoints[new]])
+            self.last_seen = np.concatenate([self.last_seen, np.full(len(new), now)])
+
+        # Evict tracks not seen for max_age
+        alive = (now - self.last_seen) <= self.max_age
+        lost = self.ids[~alive].tolist()
+        if lost:
+            self.ids = self.ids[alive]
+            self.boxes = self.boxes[alive]
+            self.keypoints = self.keypoints[alive]
+            self.last_seen = self.last_seen[alive]
+
+        return det_ids, lost
+
+    def reset(self):
+        """Drop every track (ids keep increasing). Returns the ids that were dropped."""
+        lost = self.ids.tolist()
+        alive = np.zeros(len(self.ids), bool)
+        self.ids = self.ids[alive]
+        self.boxes = self.boxes[alive]
+        self.keypoints = self.keypoints[alive]
+        self.last_seen = self.last_seen[alive]
+        return lost
@@ -0,0 +1,116 @@
+import argparse
+import glob
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+# Add backend to path
+sys.path.append(os.path.join(os.getcwd(), 'backend'))
+
+from source.vision.inference_backends import BACKENDS
+from source.vision.model_registry import get_model, DEFAULT_POSE_MODEL
+
+
+def load_frames(source, limit):
+    """Frames from a video file, an image directory, or the recordings/ clips."""
+    frames = []
+    if source and os.path.isdir(source):
+        for path in sorted(glob.glob(os.path.join(source, "*.jpg")))[:limit]:
+            frames.append(cv2.imread(path))
+        return frames
+
+    videos = [source] if source else sorted(glob.glob(os.path.join("recordings", "*.mp4")))
+    for path in videos:
+        cap = cv2.VideoCapture(path)
+        while len(frames) < limit:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+        cap.release()
+        if len(frames) >= limit:
+            break
+    return frames
+
+
+def first_person_keypoints(results):
+    """Same (17, 2) normalised keypoints PoseService hands to FallDetector, or None."""
+    for result in results:
+        if result.keypoints is not None and result.keypoints.xyn.shape[0] > 0 and result.keypoints.xyn.shape[1] >= 17:
+            return np.asarray(result.keypoints.xyn[0].cpu())
+    return None
+
+
+def run_backend(backend, frames, args):
+    model = get_model(args.weights, device="cpu", imgsz=args.imgsz, backend=backend, int8_data=args.int8_data)
+
+    # Warm-up (graph compilation, thread pools)
+    for frame in frames[:3]:
+        model(frame, verbose=False, conf=0.5)
+
+    latencies = []
+    keypoints = []
+    for frame in frames:
+        start = time.perf_counter()
+        results = model(frame, verbose=False, conf=0.5)
+        latencies.append((time.perf_counter() - start) * 1000)
+        keypoints.append(first_person_keypoints(results))
+    return np.array(latencies), keypoints
+
+
+def agreement(reference, candidate):
+    """Detection agreement rate and mean keypoint distance (normalised units)."""
+    same_detection = 0
+    errors = []
+    for ref, cand in zip(reference, candidate):
+        if (ref is None) == (cand is None):
+            same_detection += 1
+        if ref is not None and cand is not None:
+            errors.append(np.abs(ref - cand).mean())
+    detection_rate = same_detection / len(reference) if reference else 0
+    mean_error = float(np.mean(errors)) if errors else float("nan")
+    return detection_rate, mean_error
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare pose inference backends against the PyTorch path")
+    parser.add_argument("--source", help="Video file or directory of .jpg frames (default: recordings/*.mp4)")
+    parser.add_argument("--weights", default=DEFAULT_POSE_MODEL)
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "openvino"], choices=BACKENDS)
+    parser.add_argument("--int8-data", dest="int8_data", help="Calibration dataset yaml for openvino_int8")
+    args = parser.parse_args()
+
+    frames = load_frames(args.source, args.frames)
+    if not frames:
+        print("No frames found.")
+        return
+    print(f"Benchmarking {len(frames)} frames at imgsz={args.imgsz}")
+
+    backends = ["torch"] + [b for b in args.backends if b != "torch"]
+    reference = None
+
+    print(f"{'backend':15s} {'mean ms':>8s} {'p50 ms':>8s} {'p95 ms':>8s} {'det agree':>10s} {'kpt err':>8s}")
+    for backend in backends:
+        try:
+            latencies, keypoints = run_backend(backend, frames, args)
+        except Exception as e:
+            print(f"{backend:15s} unavailable: {e}")
+            continue
+
+        if reference is None:
+            reference = keypoints
+        rate, error = agreement(reference, keypoints)
+
+        print(
+            f"{backend:15s} {latencies.mean():8.1f} {np.percentile(latencies, 50):8.1f} "
+            f"{np.percentile(latencies, 95):8.1f} {rate:10.1%} {error:8.4f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+import argparse
+import glob
+import json
+import os
+import sys
+
+# Add backend to path
+sys.path.append(os.path.join(os.getcwd(), 'backend'))
+
+from source.analysis.replay import replay_files
+
+
+def load_vision_settings(path):
+    if path and os.path.exists(path):
+        with open(path, 'r') as f:
+            return json.load(f).get("vision", {})
+    return {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-run fall detection offline over recorded video")
+    parser.add_argument("files", nargs="*", help="Video files (default: recordings/*.mp4)")
+    parser.add_argument("--workers", type=int, default=None, help="Parallel processes (default: half the cores)")
+    parser.add_argument("--out", default="replays", help="Directory for <name>.timeline.json files")
+    parser.add_argument("--settings", default="settings.json", help="settings.json whose \"vision\" section is used")
+    args = parser.parse_args()
+
+    files = args.files or sorted(glob.glob(os.path.join("recordings", "*.mp4")))
+    if not files:
+        print("No video files found.")
+        return
+
+    settings = load_vision_settings(args.settings)
+    print(f"Replaying {len(files)} file(s)...")
+
+    for timeline in replay_files(files, workers=args.workers, settings=settings, output_dir=args.out):
+        if "error" in timeline:
+            print(f"[Replay] {timeline['file']}: ERROR {timeline['error']}")
+            continue
+        print(
+            f"[Replay] {timeline['file']}: {timeline['duration']:.1f}s of video in "
+            f"{timeline['processing_time']:.1f}s (x{timeline['speedup']}), {len(timeline['events'])} events"
+        )
+        for event in timeline["events"]:
+            print(f"    {event['t']:8.2f}s  #{event['track']}  {event['event']} ({event['posture']})")
+
+
+if __name__ == "__main__":
+    main()
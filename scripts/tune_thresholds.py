@@ -0,0 +1,74 @@
+import argparse
+import json
+import os
+import sys
+
+# Add backend to path
+sys.path.append(os.path.join(os.getcwd(), 'backend'))
+
+from source.analysis.tuning import (
+    load_sequences, grid_configs, random_configs, tune, write_camera_params
+)
+
+DEFAULT_GRID = {
+    "shoulder_ankle": [0.12, 0.15, 0.18],
+    "body_height": [0.07, 0.09, 0.11],
+    "knee_hip": [0.06, 0.075, 0.09],
+    "state_delay": [0.5, 1.0],
+    "confirm_time": [3.0, 5.0],
+    "window": [5, 9, 13],
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search FallDetector thresholds over labelled keypoint traces")
+    parser.add_argument("labels", help="JSON list of labelled sequences (see source/analysis/tuning.py)")
+    parser.add_argument("--grid", help="JSON file {param: [values]} (default: built-in grid)")
+    parser.add_argument("--random", type=int, default=0, help="Random search with N samples instead of a grid")
+    parser.add_argument("--ranges", help="JSON file {param: [min, max]} for --random")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--tolerance", type=float, default=2.0, help="Seconds after a labelled fall a detection still counts")
+    parser.add_argument("--trace-dir", default="traces")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--camera", help="Write the winning params into this camera's settings")
+    parser.add_argument("--cameras-file", default="cameras.json")
+    parser.add_argument("--out", help="Write the full report as JSON")
+    args = parser.parse_args()
+
+    sequences = load_sequences(args.labels, trace_dir=args.trace_dir)
+    print(f"Loaded {len(sequences)} sequence(s), {sum(len(s['ts']) for s in sequences)} samples, "
+          f"{sum(len(s['falls']) for s in sequences)} labelled falls")
+
+    if args.random:
+        ranges = DEFAULT_GRID
+        if args.ranges:
+            with open(args.ranges) as f:
+                ranges = json.load(f)
+        ranges = {k: [min(v), max(v)] for k, v in ranges.items()}
+        configs = random_configs(ranges, args.random)
+    else:
+        grid = DEFAULT_GRID
+        if args.grid:
+            with open(args.grid) as f:
+                grid = json.load(f)
+        configs = grid_configs(grid)
+
+    print(f"Evaluating {len(configs)} configurations...")
+    report = tune(configs, sequences, workers=args.workers, tolerance=args.tolerance)
+
+    print(f"{'f1':>6s} {'prec':>6s} {'recall':>6s} {'lat(s)':>7s}  params")
+    for row in report[:args.top]:
+        latency = f"{row['latency_mean']:.2f}" if row["latency_mean"] is not None else "-"
+        print(f"{row['f1']:6.3f} {row['precision']:6.3f} {row['recall']:6.3f} {latency:>7s}  {row['params']}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=4)
+
+    if args.camera and report:
+        write_camera_params(args.cameras_file, args.camera, report[0]["params"])
+        print(f"Saved best params for camera {args.camera} in {args.cameras_file}")
+
+
+if __name__ == "__main__":
+    main()